@@ -0,0 +1,418 @@
+"""
+Out-of-process audio capture for the Spotify Voice Assistant
+
+A worker process reads the microphone, resamples (with an anti-aliasing
+filter) to the rate sent to speech recognition and computes per-frame
+energy. Frames and energies reach the main process through a shared-memory
+ring buffer, so TTS, Spotify API calls and JSON parsing holding the GIL can
+no longer make capture fall behind.
+
+WorkerMicrophone is a speech_recognition AudioSource. Its listen() and
+adjust_for_ambient_noise() follow Recognizer's, but detect speech from the
+worker's energies instead of computing RMS in the main process.
+"""
+
+import collections
+import math
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+# Header fields (int64) - each is written by one side only
+WRITE_SEQ = 0          # frames written so far (worker)
+CAPTURE_OVERFLOWS = 1  # PortAudio input overflows, i.e. frames the device dropped (worker)
+READER_OVERRUNS = 2    # frames overwritten before the main process read them (reader)
+WORKER_STOPPED = 3     # set when capture ends, e.g. after a device error (worker)
+HEADER_FIELDS = 8
+
+# Per-stage CPU seconds (float64)
+CPU_STAGES = ('capture', 'resample', 'energy', 'write', 'read')
+
+# Taps of the low-pass filter applied before downsampling
+RESAMPLE_TAPS = 63
+
+# Spawn rather than fork: the main process already runs TTS and prewarm threads
+_mp = mp.get_context('spawn')
+
+
+class SharedFrameRing:
+    """Single-producer, single-consumer ring of fixed-size int16 frames in shared memory"""
+
+    def __init__(self, slots: int, frame_samples: int, name: Optional[str] = None):
+        self.slots = slots
+        self.frame_samples = frame_samples
+
+        header_bytes = HEADER_FIELDS * 8
+        cpu_bytes = len(CPU_STAGES) * 8
+        energy_bytes = slots * 8
+        frame_bytes = slots * frame_samples * 2
+        size = header_bytes + cpu_bytes + energy_bytes + frame_bytes
+
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            # The worker shares the parent's resource tracker, so attaching is safe
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+
+        # NumPy views straight onto the shared buffer - no copies on either side
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=buf, offset=0)
+        self.cpu = np.ndarray((len(CPU_STAGES),), dtype=np.float64, buffer=buf, offset=header_bytes)
+        self.energy = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=header_bytes + cpu_bytes)
+        self.frames = np.ndarray((slots, frame_samples), dtype=np.int16, buffer=buf,
+                                 offset=header_bytes + cpu_bytes + energy_bytes)
+        if self.owner:
+            self.header[:] = 0
+            self.cpu[:] = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, samples: np.ndarray, energy: float):
+        """Store the next frame (worker side)"""
+        seq = int(self.header[WRITE_SEQ])
+        slot = seq % self.slots
+        self.frames[slot, :] = samples
+        self.energy[slot] = energy
+        # Publish only after the frame is complete
+        self.header[WRITE_SEQ] = seq + 1
+
+    def frame(self, seq: int):
+        """Zero-copy view of frame seq and its energy, or None if it was already overwritten"""
+        if int(self.header[WRITE_SEQ]) - seq > self.slots:
+            return None
+        slot = seq % self.slots
+        return self.frames[slot], float(self.energy[slot])
+
+    def close(self):
+        # Drop the views before releasing the buffer they point into
+        del self.header, self.cpu, self.energy, self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _lowpass_taps(cutoff: float, taps: int = RESAMPLE_TAPS) -> np.ndarray:
+    """Windowed-sinc low-pass FIR filter; cutoff is a fraction of the input sample rate"""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return h / h.sum()
+
+
+class _Resampler:
+    """Converts fixed-size frames of input_samples into frames of frame_samples
+
+    Downsampling first removes everything above the new Nyquist frequency,
+    or it folds back into the speech band. Filter history carries across
+    frames, so frame boundaries don't click.
+    """
+
+    def __init__(self, input_samples: int, frame_samples: int, device_rate: int, output_rate: int):
+        self.input_samples = input_samples
+        self.frame_samples = frame_samples
+        # Output samples are evenly spaced over the whole input frame, which
+        # keeps the spacing the same across frame boundaries
+        self.positions = np.arange(frame_samples) * input_samples / frame_samples
+        self.source_positions = np.arange(input_samples)
+        self.taps = _lowpass_taps(0.45 * output_rate / device_rate) if output_rate < device_rate else None
+        self.history = np.zeros(RESAMPLE_TAPS - 1, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.input_samples == self.frame_samples:
+            return samples
+        signal = samples.astype(np.float32)
+        if self.taps is not None:
+            padded = np.concatenate((self.history, signal))
+            self.history = padded[-(RESAMPLE_TAPS - 1):]
+            signal = np.convolve(padded, self.taps, mode='valid')
+        return np.clip(np.interp(self.positions, self.source_positions, signal), -32768, 32767).astype(np.int16)
+
+
+def _capture_main(ring_name, slots, frame_samples, device_index, target_rate, stop_event, conn):
+    """Worker process: read the device, resample, measure energy and publish frames"""
+    import pyaudio
+
+    ring = SharedFrameRing(slots, frame_samples, name=ring_name)
+    audio = pyaudio.PyAudio()
+    stream = None
+    try:
+        if device_index is None:
+            device_info = audio.get_default_input_device_info()
+        else:
+            device_info = audio.get_device_info_by_index(device_index)
+        device_rate = int(device_info['defaultSampleRate'])
+        output_rate = target_rate or device_rate
+
+        # Read enough input for exactly one output frame
+        input_samples = int(round(frame_samples * device_rate / output_rate))
+        stream = audio.open(input_device_index=device_index, channels=1, format=pyaudio.paInt16,
+                            rate=device_rate, frames_per_buffer=input_samples, input=True)
+        conn.send(('ready', output_rate))
+    except Exception as e:
+        conn.send(('error', str(e)))
+        audio.terminate()
+        ring.close()
+        return
+
+    resampler = _Resampler(input_samples, frame_samples, device_rate, output_rate)
+    try:
+        while not stop_event.is_set():
+            started = time.process_time()
+            try:
+                data = stream.read(input_samples, exception_on_overflow=True)
+            except IOError as e:
+                if e.errno != pyaudio.paInputOverflowed:
+                    # Unplugged or otherwise failing device: let the main process fail over
+                    raise
+                # The device dropped samples; count it and keep going
+                ring.header[CAPTURE_OVERFLOWS] += 1
+                continue
+            samples = np.frombuffer(data, dtype=np.int16)
+            captured = time.process_time()
+
+            samples = resampler.process(samples)
+            resampled = time.process_time()
+
+            energy = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+            measured = time.process_time()
+
+            ring.write(samples, energy)
+            written = time.process_time()
+
+            ring.cpu[0] += captured - started
+            ring.cpu[1] += resampled - captured
+            ring.cpu[2] += measured - resampled
+            ring.cpu[3] += written - measured
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        ring.header[WORKER_STOPPED] = 1
+        try:
+            stream.stop_stream()
+            stream.close()
+        except Exception:
+            pass  # the device may already be gone
+        audio.terminate()
+        ring.close()
+
+
+class _RingStream:
+    """File-like reader over the ring, as Recognizer.listen() expects from source.stream"""
+
+    def __init__(self, source: 'WorkerMicrophone'):
+        self.source = source
+
+    def read(self, size: int) -> bytes:
+        source = self.source
+        ring = source.ring
+        # Half a frame between polls keeps latency low without spinning
+        poll_interval = source.CHUNK / source.SAMPLE_RATE / 2
+        deadline = time.monotonic() + source.read_timeout
+        while int(ring.header[WRITE_SEQ]) <= source.read_seq:
+            if ring.header[WORKER_STOPPED] or not source.process.is_alive():
+                raise OSError(f"audio worker stopped: {source.worker_error() or 'no error reported'}")
+            if time.monotonic() > deadline:
+                raise OSError(f"no audio from the capture worker for {source.read_timeout}s")
+            time.sleep(poll_interval)
+
+        started = time.thread_time()
+        while True:
+            written = int(ring.header[WRITE_SEQ])
+            if written - source.read_seq >= ring.slots:
+                # We fell a whole ring behind; skip past the slot the writer fills next
+                # to the oldest frame that will still be there
+                ring.header[READER_OVERRUNS] += written - source.read_seq - ring.slots + 1
+                source.read_seq = written - ring.slots + 1
+            frame = ring.frame(source.read_seq)
+            if frame is not None:
+                break
+            # The writer moved on between reading WRITE_SEQ and the frame; catch up again
+
+        samples, energy = frame
+        data = samples.tobytes()
+        # The writer may have lapped us while copying
+        if ring.frame(source.read_seq) is None:
+            ring.header[READER_OVERRUNS] += 1
+        source.read_seq += 1
+        source.last_energy = energy
+        ring.cpu[4] += time.thread_time() - started
+        return data
+
+
+class WorkerMicrophone(sr.AudioSource):
+    """Microphone captured by a separate process and shared through a SharedFrameRing
+
+    The worker keeps capturing between listens; entering the source skips any
+    audio that arrived while nobody was listening.
+    """
+
+    def __init__(self, device_index: Optional[int] = None, sample_rate: Optional[int] = 16000,
+                 chunk_size: int = 1024, slots: int = 512, read_timeout: float = 2.0):
+        self.device_index = device_index
+        self.target_rate = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.SAMPLE_RATE = sample_rate
+        self.CHUNK = chunk_size
+        self.slots = slots
+        self.read_timeout = read_timeout
+
+        self.ring = None
+        self.process = None
+        self._conn = None
+        self._error = None
+        self.stream = None
+        self.read_seq = 0
+        self.last_energy = 0.0
+        self._stop_event = None
+
+    def start(self, timeout: float = 5.0):
+        """Start the capture process and wait until the device is open"""
+        self.ring = SharedFrameRing(self.slots, self.CHUNK)
+        self._stop_event = _mp.Event()
+        parent_conn, child_conn = _mp.Pipe()
+        self.process = _mp.Process(
+            target=_capture_main,
+            args=(self.ring.name, self.slots, self.CHUNK, self.device_index, self.target_rate,
+                  self._stop_event, child_conn),
+            daemon=True)
+        self.process.start()
+        self._conn = parent_conn
+
+        if not parent_conn.poll(timeout):
+            self.close()
+            raise OSError("audio worker did not start")
+        status, value = parent_conn.recv()
+        if status != 'ready':
+            self.close()
+            raise OSError(f"audio worker failed: {value}")
+
+        self.SAMPLE_RATE = value
+        self.stream = _RingStream(self)
+
+    def __enter__(self):
+        if self.process is None:
+            self.start()
+        elif not self.process.is_alive():
+            raise OSError("audio worker stopped")
+        # Only hand out audio captured from now on
+        self.read_seq = int(self.ring.header[WRITE_SEQ])
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Capture keeps running so the next listen starts instantly
+        pass
+
+    def worker_error(self) -> Optional[str]:
+        """The error the worker stopped with, if it reported one"""
+        if self._error is None and self._conn is not None:
+            try:
+                if self._conn.poll():
+                    self._error = self._conn.recv()[1]
+            except (EOFError, OSError):
+                pass
+        return self._error
+
+    def adjust_for_ambient_noise(self, recognizer: sr.Recognizer, duration: float = 1):
+        """Recognizer.adjust_for_ambient_noise using the worker's frame energies"""
+        seconds_per_buffer = self.CHUNK / self.SAMPLE_RATE
+        elapsed_time = 0
+        while True:
+            elapsed_time += seconds_per_buffer
+            if elapsed_time > duration:
+                break
+            self.stream.read(self.CHUNK)
+            damping = recognizer.dynamic_energy_adjustment_damping ** seconds_per_buffer
+            target_energy = self.last_energy * recognizer.dynamic_energy_ratio
+            recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+
+    def listen(self, recognizer: sr.Recognizer, timeout: Optional[float] = None,
+               phrase_time_limit: Optional[float] = None) -> sr.AudioData:
+        """Recognizer.listen using the worker's frame energies for speech detection
+
+        Same thresholds, timeouts and result as Recognizer.listen; only the
+        per-chunk RMS, which Recognizer computes in this process, comes from
+        the worker instead.
+        """
+        seconds_per_buffer = self.CHUNK / self.SAMPLE_RATE
+        pause_buffer_count = int(math.ceil(recognizer.pause_threshold / seconds_per_buffer))
+        phrase_buffer_count = int(math.ceil(recognizer.phrase_threshold / seconds_per_buffer))
+        non_speaking_buffer_count = int(math.ceil(recognizer.non_speaking_duration / seconds_per_buffer))
+
+        elapsed_time = 0
+        while True:
+            frames = collections.deque()
+
+            # Keep a little audio from before the phrase until speech starts
+            while True:
+                elapsed_time += seconds_per_buffer
+                if timeout and elapsed_time > timeout:
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                frames.append(self.stream.read(self.CHUNK))
+                if len(frames) > non_speaking_buffer_count:
+                    frames.popleft()
+                energy = self.last_energy
+                if energy > recognizer.energy_threshold:
+                    break
+                if recognizer.dynamic_energy_threshold:
+                    damping = recognizer.dynamic_energy_adjustment_damping ** seconds_per_buffer
+                    target_energy = energy * recognizer.dynamic_energy_ratio
+                    recognizer.energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+
+            # Record until a long enough pause or the phrase time limit
+            pause_count, phrase_count = 0, 0
+            phrase_start_time = elapsed_time
+            while True:
+                elapsed_time += seconds_per_buffer
+                if phrase_time_limit and elapsed_time - phrase_start_time > phrase_time_limit:
+                    break
+                frames.append(self.stream.read(self.CHUNK))
+                phrase_count += 1
+                if self.last_energy > recognizer.energy_threshold:
+                    pause_count = 0
+                else:
+                    pause_count += 1
+                if pause_count > pause_buffer_count:
+                    break
+
+            # Too short to be a phrase (a click or a cough): keep listening
+            phrase_count -= pause_count
+            if phrase_count >= phrase_buffer_count:
+                break
+
+        # Drop the trailing silence beyond what Recognizer.listen keeps
+        for _ in range(pause_count - non_speaking_buffer_count):
+            frames.pop()
+        return sr.AudioData(b"".join(frames), self.SAMPLE_RATE, self.SAMPLE_WIDTH)
+
+    def stats(self) -> Dict[str, Any]:
+        """Overrun counters and CPU seconds spent in each stage"""
+        if self.ring is None:
+            return {}
+        return {
+            'frames': int(self.ring.header[WRITE_SEQ]),
+            'capture_overflows': int(self.ring.header[CAPTURE_OVERFLOWS]),
+            'reader_overruns': int(self.ring.header[READER_OVERRUNS]),
+            'cpu_s': {stage: float(seconds) for stage, seconds in zip(CPU_STAGES, self.ring.cpu)},
+        }
+
+    def close(self):
+        """Stop the worker and release the shared memory"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+        self._conn = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        self.stream = None
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Offline API-layer benchmark for the Spotify Voice Assistant
+
+Drives SpotifyAssistant.process_command against the local fake Web API in
+fake_spotify_api.py and reports HTTP calls per intent, p50/p99 latency and
+throughput. No microphone, speaker or network access is needed.
+
+Examples:
+    python benchmark.py
+    python benchmark.py --latency 0.05 --error 429=0.05 --device-state inactive
+    python benchmark.py --write-baseline bench_baseline.json
+    python benchmark.py --baseline bench_baseline.json   # exits 1 on regressions (run in CI)
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import spotipy
+
+from fake_spotify_api import DEVICE_STATES, FakeSpotifyServer, FakeSpotifyState, parse_error_rates
+from spotify_assistant import SpotifyAssistant
+
+# (intent, spoken command) pairs driven through process_command
+DEFAULT_COMMANDS = [
+    ('play_music', 'play'),
+    ('pause_music', 'pause'),
+    ('skip_track', 'skip'),
+    ('previous_track', 'previous'),
+    ('set_volume', 'volume 40'),
+    ('shuffle_on', 'shuffle on'),
+    ('repeat_off', 'repeat off'),
+    ('what_song', 'what song'),
+    ('search_and_play', 'search and play bohemian rhapsody'),
+    ('play_artist', 'play artist radiohead'),
+    ('play_playlist', 'play playlist discover weekly'),
+    ('play_track_number', 'play track 3'),
+    ('like_song', 'like'),
+    ('play_liked_songs', 'play liked'),
+    ('play_shortcut', 'play focus'),
+    ('play_shortcut', 'play radiohead'),
+]
+
+# Voice shortcuts resolved by every benchmark assistant at startup
+BENCHMARK_SHORTCUTS = {
+    'play focus': {'search': 'focus', 'type': 'playlist'},
+    'play radiohead': 'spotify:artist:4Z8W4fKeB5YxbusRsdQVPb',
+}
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def make_assistant(server: FakeSpotifyServer, client_id: str, cache_path=None) -> SpotifyAssistant:
+    """Build an audio-less assistant whose Spotify client talks to the fake API"""
+    # cache_path=None keeps the assistant from opening the user's cache in the working directory
+    assistant = SpotifyAssistant(enable_audio=False, cache_path=cache_path)
+    assistant.spotify = spotipy.Spotify(auth='fake-token', requests_session=assistant.connections.spotify_session)
+    assistant.spotify.prefix = server.prefix
+    # Lets the fake server attribute calls (including retries) to this worker
+    assistant.spotify._session.headers['X-Client-Id'] = client_id
+    # Benchmark commands shouldn't end up in the user's prefetch history
+    assistant.usage_history = None
+    assistant.resolve_shortcuts(BENCHMARK_SHORTCUTS)
+    return assistant
+
+
+def run_worker(server, worker_id, commands, iterations, cache_dir, samples, lock):
+    cache_path = os.path.join(cache_dir, f'worker{worker_id}.db') if cache_dir else None
+    client_id = f'worker{worker_id}'
+    assistant = make_assistant(server, client_id, cache_path)
+
+    for _ in range(iterations):
+        for intent, command in commands:
+            calls_before = server.state.client_calls(client_id)
+            started = time.perf_counter()
+            assistant.process_command(command)
+            elapsed = time.perf_counter() - started
+            calls = server.state.client_calls(client_id) - calls_before
+            with lock:
+                samples[intent].append((calls, elapsed))
+
+
+def run_benchmark(args) -> dict:
+    state = FakeSpotifyState(args.latency, args.jitter, parse_error_rates(args.error),
+                             args.device_state, seed=args.seed)
+    server = FakeSpotifyServer(state).start()
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = None if args.no_cache else tmp
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        started = time.perf_counter()
+        with output:
+            workers = [
+                threading.Thread(target=run_worker,
+                                 args=(server, i, DEFAULT_COMMANDS, args.iterations, cache_dir, samples, lock))
+                for i in range(args.concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        wall_time = time.perf_counter() - started
+
+    server.stop()
+
+    intents = {}
+    for intent in dict(DEFAULT_COMMANDS):
+        calls = [sample[0] for sample in samples[intent]]
+        latencies = [sample[1] for sample in samples[intent]]
+        intents[intent] = {
+            'runs': len(calls),
+            'calls_mean': sum(calls) / len(calls) if calls else 0.0,
+            'calls_max': max(calls) if calls else 0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+        }
+
+    total_commands = sum(intent['runs'] for intent in intents.values())
+    return {
+        'config': {
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'latency': args.latency,
+            'errors': args.error or [],
+            'device_state': args.device_state,
+            'cache': not args.no_cache,
+        },
+        'intents': intents,
+        'total_commands': total_commands,
+        'total_calls': sum(state.call_counts.values()),
+        'calls_by_endpoint': dict(state.call_counts),
+        'wall_time_s': wall_time,
+        'throughput_cmd_s': total_commands / wall_time if wall_time else 0.0,
+    }
+
+
+def print_report(report: dict):
+    print(f"{'intent':<20} {'runs':>5} {'calls':>6} {'max':>4} {'p50 ms':>8} {'p99 ms':>8}")
+    for intent, stats in report['intents'].items():
+        print(f"{intent:<20} {stats['runs']:>5} {stats['calls_mean']:>6.2f} {stats['calls_max']:>4} "
+              f"{stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+    print(f"\n{report['total_commands']} commands, {report['total_calls']} HTTP calls in "
+          f"{report['wall_time_s']:.2f}s ({report['throughput_cmd_s']:.1f} commands/s)")
+
+
+def check_baseline(report: dict, baseline_path: str, tolerance: float) -> list:
+    """Return a list of intents whose mean call count grew past the baseline"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for intent, expected in baseline.get('calls_mean', {}).items():
+        actual = report['intents'].get(intent, {}).get('calls_mean')
+        if actual is not None and actual > expected + tolerance:
+            regressions.append(f"{intent}: {actual:.2f} calls (baseline {expected:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SpotifyAssistant against a local fake Spotify Web API")
+    parser.add_argument('--iterations', type=int, default=5, help="times each command is run per worker")
+    parser.add_argument('--concurrency', type=int, default=1, help="number of assistants running in parallel")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every API response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument('--error', action='append', metavar='STATUS=RATE',
+                        help="inject API errors, e.g. --error 429=0.05 --error 404=0.01")
+    parser.add_argument('--device-state', choices=DEVICE_STATES, default='active')
+    parser.add_argument('--no-cache', action='store_true', help="run without the catalog cache")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help="show the assistant's own output")
+    parser.add_argument('--json', metavar='FILE', help="write the full report as JSON")
+    parser.add_argument('--write-baseline', metavar='FILE', help="save mean calls per intent as a baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="fail if mean calls per intent exceed this baseline")
+    parser.add_argument('--tolerance', type=float, default=0.0, help="allowed calls above the baseline")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # spotipy logs every HTTP error, including the injected ones
+        logging.getLogger('spotipy').setLevel(logging.CRITICAL)
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.write_baseline:
+        with open(args.write_baseline, 'w') as f:
+            json.dump({'calls_mean': {intent: stats['calls_mean'] for intent, stats in report['intents'].items()}},
+                      f, indent=2)
+        print(f"Baseline written to {args.write_baseline}")
+
+    if args.baseline:
+        regressions = check_baseline(report, args.baseline, args.tolerance)
+        if regressions:
+            print("\n❌ API call regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\n✅ No API call regressions")
+
+
+if __name__ == "__main__":
+    main()
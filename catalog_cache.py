@@ -0,0 +1,232 @@
+"""
+Persistent catalog metadata cache for the Spotify Voice Assistant
+
+Stores Spotify Web API responses (searches, artist top tracks, playlist
+tracks, liked songs) in a small SQLite database so repeated requests - in the same
+process or after a restart - are answered without a network round trip.
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Default time-to-live per endpoint, in seconds
+DEFAULT_TTLS = {
+    'search': 24 * 3600,
+    # Playlist search results carry the snapshot_id that playlist tracks are
+    # revalidated against, so they must not outlive an edit for long
+    'playlist_search': 600,
+    'artist_top_tracks': 24 * 3600,
+    # Playlist tracks are keyed by snapshot_id, so a changed playlist is
+    # always a miss and the TTL only bounds how long stale rows linger
+    'playlist_tracks': 7 * 24 * 3600,
+    # Liked songs change whenever the user likes something, possibly on another device
+    'saved_tracks': 600,
+}
+
+
+class CatalogCache:
+    """Disk-backed key/value cache with per-endpoint TTLs and LRU eviction"""
+
+    def __init__(self, path: str, max_entries: int = 2000, max_bytes: int = 20 * 1024 * 1024,
+                 ttls: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+
+        self.hits = 0
+        self.misses = 0
+        self.endpoint_stats = {}
+
+        # Entries stored by background prefetching, and how many were later used
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self.prefetch_loads = 0
+
+        # Hits are recorded in memory and written out with the next put(), so a
+        # cache hit never waits on the disk
+        self._touched = {}
+        self._prefetch_used = set()
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " endpoint TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(entries)")]
+        if 'prefetched' not in columns:
+            self._db.execute("ALTER TABLE entries ADD COLUMN prefetched INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(endpoint: str, *parts) -> str:
+        """Build a cache key from an endpoint name and its arguments
+
+        Parts are used as-is: Spotify IDs and snapshot_ids are case-sensitive,
+        so callers normalize free text (like search queries) themselves.
+        """
+        return endpoint + '|' + '|'.join(str(part) for part in parts)
+
+    @contextlib.contextmanager
+    def prefetching(self):
+        """Mark entries stored by this thread as prefetched and keep its lookups out of the hit/miss counts"""
+        self._local.prefetching = True
+        try:
+            yield
+        finally:
+            self._local.prefetching = False
+
+    @property
+    def _prefetching(self) -> bool:
+        return getattr(self._local, 'prefetching', False)
+
+    def get(self, endpoint: str, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at, prefetched FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._db.commit()
+                self._count(endpoint, hit=False)
+                return None
+
+            if row[2] and not self._prefetching and key not in self._prefetch_used:
+                # First real use of a prefetched entry
+                self.prefetch_hits += 1
+                self._prefetch_used.add(key)
+            self._touched[key] = now
+            self._count(endpoint, hit=True)
+            return json.loads(row[0])
+
+    def put(self, endpoint: str, key: str, value: Any):
+        """Store value under key with the endpoint's TTL, evicting old entries if needed"""
+        data = json.dumps(value)
+        now = time.time()
+        ttl = self.ttls.get(endpoint, 3600)
+        prefetched = self._prefetching
+        with self._lock:
+            self._flush_touched()
+            self._touched.pop(key, None)
+            self._prefetch_used.discard(key)
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, endpoint, value, size, expires_at, last_access, prefetched)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, endpoint, data, len(data), now + ttl, now, int(prefetched))
+            )
+            self._evict(now)
+            self._db.commit()
+            if prefetched:
+                self.prefetched += 1
+
+    def fetch(self, endpoint: str, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader and storing its result on a miss"""
+        value = self.get(endpoint, key)
+        if value is None:
+            if self._prefetching:
+                self.prefetch_loads += 1
+            value = loader()
+            if value is not None:
+                self.put(endpoint, key, value)
+        return value
+
+    def delete(self, key: str):
+        """Remove a single entry"""
+        with self._lock:
+            self._touched.pop(key, None)
+            self._prefetch_used.discard(key)
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        """Remove every entry from the cache"""
+        with self._lock:
+            self._touched.clear()
+            self._prefetch_used.clear()
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries,
+            'bytes': size,
+            'endpoints': {name: dict(counts) for name, counts in self.endpoint_stats.items()},
+            'prefetched': self.prefetched,
+            'prefetch_hits': self.prefetch_hits,
+            'prefetch_hit_rate': self.prefetch_hits / self.prefetched if self.prefetched else 0.0,
+            'prefetch_loads': self.prefetch_loads,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
+
+    def _count(self, endpoint: str, hit: bool):
+        if self._prefetching:
+            return
+        counts = self.endpoint_stats.setdefault(endpoint, {'hits': 0, 'misses': 0})
+        if hit:
+            self.hits += 1
+            counts['hits'] += 1
+        else:
+            self.misses += 1
+            counts['misses'] += 1
+
+    def _flush_touched(self):
+        """Write the access times and used prefetch flags recorded by get()"""
+        if self._touched:
+            self._db.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+        if self._prefetch_used:
+            self._db.executemany("UPDATE entries SET prefetched = 0 WHERE key = ?",
+                                 [(key,) for key in self._prefetch_used])
+            self._prefetch_used.clear()
+
+    def _evict(self, now: float):
+        """Drop expired rows, then least recently used rows until within limits"""
+        self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+
+        entries, size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+
+        for key, row_size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY last_access ASC"
+        ).fetchall():
+            if entries <= self.max_entries and size <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            entries -= 1
+            size -= row_size
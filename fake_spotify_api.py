@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Spotify Web API
+
+Implements the endpoints used by SpotifyAssistant with generated catalog
+data, configurable latency, injected 404/429 errors and device states, so
+the assistant can be exercised and benchmarked without network access.
+
+Run it on its own with:
+    python fake_spotify_api.py --port 8899 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEVICE_STATES = ('active', 'inactive', 'none')
+
+
+def _fake_id(*parts) -> str:
+    """Deterministic 22 character Spotify-style id"""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return digest[:22]
+
+
+def _track(track_id: str, name: str, artist: str) -> dict:
+    return {
+        'id': track_id,
+        'uri': f'spotify:track:{track_id}',
+        'name': name,
+        'artists': [{'id': _fake_id('artist', artist), 'name': artist}],
+        'album': {'id': _fake_id('album', name), 'name': f'{name} (Album)'},
+    }
+
+
+class FakeSpotifyState:
+    """Player, device and call-count state shared by all request handlers"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rates=None,
+                 device_state: str = 'active', retry_after: int = 0, seed: int = 0):
+        if device_state not in DEVICE_STATES:
+            raise ValueError(f"device_state must be one of {DEVICE_STATES}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rates = error_rates or {}  # {404: 0.05, 429: 0.1}
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        # Calls per "METHOD /path-pattern" and per client (X-Client-Id header)
+        self.call_counts = Counter()
+        self.client_counts = Counter()
+
+        self.devices = []
+        if device_state != 'none':
+            self.devices.append({
+                'id': 'fakedevice0000000000001',
+                'name': 'Fake Speaker',
+                'type': 'Computer',
+                'is_active': device_state == 'active',
+                'volume_percent': 70,
+            })
+
+        self.is_playing = False
+        self.item = None
+        self.shuffle_state = False
+        self.repeat_state = 'off'
+        self.saved_tracks = [_track(_fake_id('liked', i), f'Liked Song {i}', 'Liked Artist') for i in range(50)]
+
+    def reset_counts(self):
+        with self.lock:
+            self.call_counts.clear()
+            self.client_counts.clear()
+
+    def client_calls(self, client_id: str) -> int:
+        with self.lock:
+            return self.client_counts[client_id]
+
+    def active_device(self):
+        for device in self.devices:
+            if device['is_active']:
+                return device
+        return None
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    """Routes Web API requests to handlers operating on FakeSpotifyState"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, so avoid delayed-ACK stalls on keep-alive
+    disable_nagle_algorithm = True
+
+    # (method, path regex, handler name - also the label used in call counts)
+    ROUTES = [
+        ('GET', r'^/v1/search$', 'search'),
+        ('GET', r'^/v1/tracks/?$', 'tracks'),
+        ('GET', r'^/v1/artists/?$', 'artists'),
+        ('GET', r'^/v1/albums/?$', 'albums'),
+        ('GET', r'^/v1/playlists/([^/]+)$', 'playlist'),
+        ('GET', r'^/v1/artists/([^/]+)/top-tracks$', 'artist_top_tracks'),
+        ('GET', r'^/v1/playlists/([^/]+)/tracks$', 'playlist_tracks'),
+        ('GET', r'^/v1/me/player/devices$', 'devices'),
+        ('GET', r'^/v1/me/player$', 'current_playback'),
+        ('PUT', r'^/v1/me/player$', 'transfer_playback'),
+        ('PUT', r'^/v1/me/player/play$', 'start_playback'),
+        ('PUT', r'^/v1/me/player/pause$', 'pause_playback'),
+        ('POST', r'^/v1/me/player/next$', 'next_track'),
+        ('POST', r'^/v1/me/player/previous$', 'previous_track'),
+        ('PUT', r'^/v1/me/player/volume$', 'volume'),
+        ('PUT', r'^/v1/me/player/shuffle$', 'shuffle'),
+        ('PUT', r'^/v1/me/player/repeat$', 'repeat'),
+        ('GET', r'^/v1/me/tracks/?$', 'saved_tracks'),
+        ('PUT', r'^/v1/me/tracks/?$', 'saved_tracks_add'),
+    ]
+
+    @property
+    def state(self) -> FakeSpotifyState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str):
+        parsed = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'null') if length else None
+
+        for route_method, pattern, name in self.ROUTES:
+            match = re.match(pattern, parsed.path)
+            if route_method == method and match:
+                break
+        else:
+            self._send_error(404, f"Unknown endpoint {method} {parsed.path}")
+            return
+
+        state = self.state
+        with state.lock:
+            state.call_counts[name] += 1
+            state.client_counts[self.headers.get('X-Client-Id', 'anonymous')] += 1
+            delay = state.latency + state.random.uniform(0, state.jitter)
+            roll = state.random.random()
+
+        if delay:
+            time.sleep(delay)
+
+        # Injected failures
+        threshold = 0.0
+        for status in (429, 404):
+            threshold += state.error_rates.get(status, 0.0)
+            if roll < threshold:
+                if status == 429:
+                    self._send_error(429, "API rate limit exceeded", headers={'Retry-After': str(state.retry_after)})
+                else:
+                    self._send_error(404, "Service not found")
+                return
+
+        with state.lock:
+            getattr(self, f'_handle_{name}')(query, body, *match.groups())
+
+    # Catalog endpoints
+
+    def _handle_search(self, query, body):
+        q = query.get('q', '')
+        limit = int(query.get('limit', 10))
+        name = q.split(':', 1)[-1].strip().title() or 'Unknown'
+        results = {}
+        for search_type in query.get('type', 'track').split(','):
+            if search_type == 'track':
+                items = [_track(_fake_id('track', q, i), f'{name} {i}' if i else name, f'{name} Artist')
+                         for i in range(limit)]
+            elif search_type == 'artist':
+                items = [{'id': _fake_id('artist', q, i), 'uri': f"spotify:artist:{_fake_id('artist', q, i)}",
+                          'name': name} for i in range(limit)]
+            elif search_type == 'playlist':
+                items = [{'id': _fake_id('playlist', q, i), 'uri': f"spotify:playlist:{_fake_id('playlist', q, i)}",
+                          'name': f'{name} Mix {i}' if i else name, 'snapshot_id': _fake_id('snapshot', q, i),
+                          'tracks': {'total': 30}} for i in range(limit)]
+            else:
+                items = []
+            results[search_type + 's'] = {'items': items, 'limit': limit, 'total': len(items)}
+        self._send_json(200, results)
+
+    def _handle_tracks(self, query, body):
+        ids = query.get('ids', '').split(',')
+        self._send_json(200, {'tracks': [_track(track_id, f'Track {track_id[:6]}', 'Some Artist') for track_id in ids]})
+
+    def _handle_artists(self, query, body):
+        ids = query.get('ids', '').split(',')
+        artists = [{'id': artist_id, 'uri': f'spotify:artist:{artist_id}', 'name': f'Artist {artist_id[:6]}'}
+                   for artist_id in ids]
+        self._send_json(200, {'artists': artists})
+
+    def _handle_albums(self, query, body):
+        ids = query.get('ids', '').split(',')
+        albums = [{'id': album_id, 'uri': f'spotify:album:{album_id}', 'name': f'Album {album_id[:6]}'}
+                  for album_id in ids]
+        self._send_json(200, {'albums': albums})
+
+    def _handle_playlist(self, query, body, playlist_id):
+        self._send_json(200, {'id': playlist_id, 'uri': f'spotify:playlist:{playlist_id}',
+                              'name': f'Playlist {playlist_id[:6]}', 'snapshot_id': _fake_id('snapshot', playlist_id)})
+
+    def _handle_artist_top_tracks(self, query, body, artist_id):
+        tracks = [_track(_fake_id('top', artist_id, i), f'Top Song {i + 1}', f'Artist {artist_id[:6]}')
+                  for i in range(10)]
+        self._send_json(200, {'tracks': tracks})
+
+    def _handle_playlist_tracks(self, query, body, playlist_id):
+        items = [{'track': _track(_fake_id('pltrack', playlist_id, i), f'Playlist Song {i + 1}', 'Various')}
+                 for i in range(30)]
+        self._send_json(200, {'items': items, 'total': len(items)})
+
+    def _handle_saved_tracks(self, query, body):
+        limit = int(query.get('limit', 20))
+        items = [{'track': track} for track in self.state.saved_tracks[:limit]]
+        self._send_json(200, {'items': items, 'total': len(self.state.saved_tracks)})
+
+    def _handle_saved_tracks_add(self, query, body):
+        self._send_empty()
+
+    # Player endpoints
+
+    def _handle_devices(self, query, body):
+        self._send_json(200, {'devices': [dict(device) for device in self.state.devices]})
+
+    def _handle_current_playback(self, query, body):
+        state = self.state
+        device = state.active_device()
+        if device is None:
+            self._send_empty()
+            return
+        self._send_json(200, {
+            'device': dict(device),
+            'is_playing': state.is_playing,
+            'item': state.item,
+            'shuffle_state': state.shuffle_state,
+            'repeat_state': state.repeat_state,
+            'progress_ms': 0,
+        })
+
+    def _handle_transfer_playback(self, query, body):
+        device_ids = (body or {}).get('device_ids', [])
+        found = False
+        for device in self.state.devices:
+            device['is_active'] = device['id'] in device_ids
+            found = found or device['is_active']
+        if not found:
+            self._send_error(404, "Device not found")
+            return
+        if (body or {}).get('play'):
+            self.state.is_playing = True
+        self._send_empty()
+
+    def _require_device(self) -> bool:
+        if self.state.active_device() is None:
+            self._send_error(404, "Player command failed: No active device found", reason='NO_ACTIVE_DEVICE')
+            return False
+        return True
+
+    def _handle_start_playback(self, query, body):
+        if not self._require_device():
+            return
+        body = body or {}
+        if body.get('uris'):
+            uri = body['uris'][0]
+            track_id = uri.rsplit(':', 1)[-1]
+            self.state.item = _track(track_id, f'Track {track_id[:6]}', 'Some Artist')
+        elif body.get('context_uri'):
+            context_id = body['context_uri'].rsplit(':', 1)[-1]
+            self.state.item = _track(_fake_id('pltrack', context_id, 0), 'Playlist Song 1', 'Various')
+        elif self.state.item is None:
+            self.state.item = _track(_fake_id('resume'), 'Resumed Song', 'Some Artist')
+        self.state.is_playing = True
+        self._send_empty()
+
+    def _handle_pause_playback(self, query, body):
+        if self._require_device():
+            self.state.is_playing = False
+            self._send_empty()
+
+    def _handle_next_track(self, query, body):
+        if self._require_device():
+            self.state.item = _track(_fake_id('next', time.time()), 'Next Song', 'Some Artist')
+            self._send_empty()
+
+    def _handle_previous_track(self, query, body):
+        if self._require_device():
+            self.state.item = _track(_fake_id('previous', time.time()), 'Previous Song', 'Some Artist')
+            self._send_empty()
+
+    def _handle_volume(self, query, body):
+        if self._require_device():
+            self.state.active_device()['volume_percent'] = int(query.get('volume_percent', 0))
+            self._send_empty()
+
+    def _handle_shuffle(self, query, body):
+        if self._require_device():
+            self.state.shuffle_state = query.get('state') == 'true'
+            self._send_empty()
+
+    def _handle_repeat(self, query, body):
+        if self._require_device():
+            self.state.repeat_state = query.get('state', 'off')
+            self._send_empty()
+
+    # Responses
+
+    def _send_json(self, status: int, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_empty(self):
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_error(self, status: int, message: str, reason=None, headers=None):
+        error = {'status': status, 'message': message}
+        if reason:
+            error['reason'] = reason
+        self._send_json(status, {'error': error}, headers)
+
+
+class FakeSpotifyServer(ThreadingHTTPServer):
+    """HTTP server serving the fake Web API from a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, state: FakeSpotifyState, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), FakeSpotifyHandler)
+        self.state = state
+        self._thread = None
+
+    @property
+    def prefix(self) -> str:
+        """Value to use for spotipy.Spotify.prefix"""
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def parse_error_rates(values) -> dict:
+    """Parse ["429=0.05", "404=0.01"] into {429: 0.05, 404: 0.01}"""
+    rates = {}
+    for value in values or []:
+        status, rate = value.split('=', 1)
+        rates[int(status)] = float(rate)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Spotify Web API")
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument('--error', action='append', metavar='STATUS=RATE',
+                        help="inject errors, e.g. --error 429=0.05 --error 404=0.01")
+    parser.add_argument('--device-state', choices=DEVICE_STATES, default='active')
+    args = parser.parse_args()
+
+    state = FakeSpotifyState(args.latency, args.jitter, parse_error_rates(args.error), args.device_state)
+    server = FakeSpotifyServer(state, port=args.port)
+    print(f"Fake Spotify Web API listening on {server.prefix}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Usage-driven predictive prefetch for the Spotify Voice Assistant
+
+UsageHistory keeps a small local log of the intents and targets that
+process_command resolved. PrefetchScheduler uses it from a background
+thread to predict the next likely commands - by what usually follows the
+last command and by what gets played at this time of day - and resolves
+them ahead of time, within an hourly API-call budget.
+"""
+
+import json
+import threading
+import time
+from collections import Counter, deque
+from typing import Callable, Iterable, List, Optional, Tuple
+
+# Commands further apart than this aren't treated as one following the other
+TRANSITION_WINDOW = 120
+
+
+class UsageHistory:
+    """Bounded, JSON-backed log of resolved commands"""
+
+    def __init__(self, path: str, max_entries: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.entries = []
+
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)[-max_entries:]
+        except (OSError, ValueError):
+            self.entries = []
+
+    def record(self, intent: str, target: Optional[str] = None, timestamp: Optional[float] = None):
+        """Append a resolved command and save the log"""
+        entry = {'time': timestamp or time.time(), 'intent': intent, 'target': target}
+        with self._lock:
+            self.entries.append(entry)
+            del self.entries[:-self.max_entries]
+            entries = list(self.entries)
+
+        try:
+            with open(self.path, 'w') as f:
+                json.dump(entries, f)
+        except OSError as e:
+            print(f"⚠️ Failed to save usage history: {e}")
+
+    def predict(self, now: Optional[float] = None, limit: int = 3,
+                intents: Optional[Iterable[str]] = None) -> List[Tuple[str, Optional[str], float]]:
+        """Return up to limit (intent, target, score) guesses for the next command, best first
+
+        Scores mix how often each command followed the most recent one with
+        how often it was used within an hour of the current time of day.
+        If intents is given, only those intents are returned.
+        """
+        now = now or time.time()
+        with self._lock:
+            entries = list(self.entries)
+        if not entries:
+            return []
+
+        scores = Counter()
+        last = entries[-1]
+
+        # What followed the last intent in the past
+        if now - last['time'] <= TRANSITION_WINDOW:
+            followers = Counter()
+            for previous, following in zip(entries, entries[1:]):
+                if previous['intent'] == last['intent'] and following['time'] - previous['time'] <= TRANSITION_WINDOW:
+                    followers[(following['intent'], following['target'])] += 1
+            total = sum(followers.values())
+            for command, count in followers.items():
+                scores[command] += count / total
+
+        # What usually gets played around this time of day
+        current_minute = self._minute_of_day(now)
+        around_now = Counter()
+        for entry in entries:
+            distance = abs(self._minute_of_day(entry['time']) - current_minute)
+            if min(distance, 24 * 60 - distance) <= 60:
+                around_now[(entry['intent'], entry['target'])] += 1
+        total = sum(around_now.values())
+        for command, count in around_now.items():
+            scores[command] += count / total
+
+        if intents is not None:
+            intents = set(intents)
+            scores = Counter({command: score for command, score in scores.items() if command[0] in intents})
+        return [(intent, target, score) for (intent, target), score in scores.most_common(limit)]
+
+    @staticmethod
+    def _minute_of_day(timestamp: float) -> int:
+        local = time.localtime(timestamp)
+        return local.tm_hour * 60 + local.tm_min
+
+
+class PrefetchScheduler:
+    """Low-priority background thread that pre-resolves predicted commands
+
+    prefetch(intent, target, max_requests) does the work without sending more
+    than max_requests HTTP requests (retries included) and returns how many it
+    sent; is_busy() lets the scheduler stay out of the way of real commands.
+    Only predictions for the given intents are prefetched.
+    """
+
+    def __init__(self, history: UsageHistory, prefetch: Callable[[str, Optional[str], int], int],
+                 is_busy: Callable[[], bool], intents: Iterable[str], call_budget: int = 60,
+                 interval: float = 300, idle_delay: float = 2.0, min_score: float = 0.2,
+                 max_predictions: int = 3):
+        self.history = history
+        self.prefetch = prefetch
+        self.is_busy = is_busy
+        self.intents = tuple(intents)
+        self.call_budget = call_budget
+        self.interval = interval
+        self.idle_delay = idle_delay
+        self.min_score = min_score
+        self.max_predictions = max_predictions
+
+        # Time of each HTTP request sent by prefetching, for the hourly budget
+        self.calls = deque()
+        self.stats = {'runs': 0, 'prefetches': 0, 'calls': 0, 'skipped_budget': 0}
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the thread, waiting up to timeout seconds for a prefetch in progress"""
+        self._stop.set()
+        self._wake.set()
+        if timeout is not None and self._thread is not None:
+            self._thread.join(timeout)
+
+    def notify(self):
+        """A command just ran - predict what comes next once things are idle"""
+        self._wake.set()
+
+    def budget_left(self) -> int:
+        cutoff = time.time() - 3600
+        while self.calls and self.calls[0] < cutoff:
+            self.calls.popleft()
+        return self.call_budget - len(self.calls)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            # Let the command that triggered us (and its TTS) finish first
+            time.sleep(self.idle_delay)
+            while self.is_busy() and not self._stop.is_set():
+                time.sleep(0.5)
+
+            self.run_once()
+
+    def run_once(self):
+        """Prefetch the current predictions while budget remains"""
+        self.stats['runs'] += 1
+        for intent, target, score in self.history.predict(limit=self.max_predictions, intents=self.intents):
+            if score < self.min_score or self._stop.is_set() or self.is_busy():
+                break
+            budget = self.budget_left()
+            if budget <= 0:
+                self.stats['skipped_budget'] += 1
+                break
+
+            try:
+                calls = self.prefetch(intent, target, budget)
+            except Exception as e:
+                print(f"⚠️ Prefetch of {intent} failed: {str(e)}")
+                continue
+
+            now = time.time()
+            self.calls.extend([now] * calls)
+            self.stats['calls'] += calls
+            if calls:
+                self.stats['prefetches'] += 1
@@ -2,20 +2,126 @@ import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import speech_recognition as sr
 import pyttsx3
+import queue
 import threading
 import time
 import re
-from typing import Optional, List, Dict
+from difflib import SequenceMatcher
+from typing import Optional, List, Dict, Tuple
+from audio_worker import WorkerMicrophone
+from catalog_cache import CatalogCache
+from connection_manager import ConnectionManager, RequestLimitReached
+from prefetch import PrefetchScheduler, UsageHistory
+
+# Defaults for optional settings (override them in config.py)
+TTS_ENABLED = True
+CACHE_ENABLED = True
+CACHE_PATH = ".spotify_catalog.db"
+CACHE_MAX_ENTRIES = 2000
+CACHE_MAX_BYTES = 20 * 1024 * 1024
+CACHE_TTLS = {}
+MIC_WATCHDOG_ENABLED = True
+MIC_SILENCE_TIMEOUT = 30
+MIC_HOTPLUG_POLL_INTERVAL = 5
+VOICE_SHORTCUTS = {}
+STT_NBEST_ENABLED = True
+BARGE_IN_ENABLED = True
+BARGE_IN_DUCK_VOLUME = 20
+BARGE_IN_RETRY_WINDOW = 15
+PREWARM_ENABLED = True
+AUDIO_WORKER_ENABLED = False
+AUDIO_WORKER_SAMPLE_RATE = 16000
+PREFETCH_ENABLED = True
+PREFETCH_HISTORY_PATH = ".spotify_history.json"
+PREFETCH_CALL_BUDGET = 60
+PREFETCH_INTERVAL = 300
+PREFETCH_MAX_PREDICTIONS = 3
+
 from config import *
 
+# Shortcut targets: spotify:<type>:<id> URIs or open.spotify.com/<type>/<id> links
+SHORTCUT_TYPES = ('track', 'album', 'artist', 'playlist')
+SHORTCUT_URI_PATTERN = re.compile(r'^spotify:(track|album|artist|playlist):([0-9A-Za-z]{22})$')
+SHORTCUT_URL_PATTERN = re.compile(r'^https?://open\.spotify\.com/(track|album|artist|playlist)/([0-9A-Za-z]{22})')
+
+# Intents that take an argument, with what to say when it's missing
+MISSING_ARGUMENT_MESSAGES = {
+    'play_playlist': "Please specify a playlist name",
+    'play_track_number': "Please specify a track number",
+    'search_and_play': "Please specify what to search for",
+    'play_artist': "Please specify an artist name",
+    'set_volume': "Please specify a volume level (0-100)",
+}
+
+# Intents that leave music playing, for the barge-in's idea of the player state
+PLAYBACK_STARTING_INTENTS = ('play_music', 'skip_track', 'previous_track', 'play_artist', 'play_liked_songs',
+                             'search_and_play', 'play_playlist', 'play_track_number', 'play_shortcut')
+
+# Intents whose lookups can be resolved ahead of time, and those whose argument is worth remembering
+PREFETCH_INTENTS = ('play_playlist', 'play_artist', 'play_liked_songs')
+HISTORY_TARGET_INTENTS = ('play_playlist', 'play_artist', 'search_and_play')
+
 class SpotifyAssistant:
-    def __init__(self):
+    def __init__(self, enable_audio: bool = True, cache_path: Optional[str] = CACHE_PATH):
         self.spotify = None
         self.recognizer = sr.Recognizer()
         self.microphone = None
-        self.tts_engine = pyttsx3.init()
+        self.microphone_name = None
+        self.tts_engine = pyttsx3.init() if enable_audio else None
         self.is_listening = False
         self.current_playlist_tracks = []
+        self.catalog_cache = None
+        self.shortcuts = {}
+        
+        # Pooled keep-alive sessions for Spotify and STT, warmed up on wake word
+        self.connections = ConnectionManager(stt_timeout=self.recognizer.operation_timeout)
+        
+        # Names of artists, playlists and songs seen this session, used to score STT alternatives
+        self.known_entities = set()
+        self.nbest_stats = {'commands': 0, 'rescued': 0, 'reranked': 0, 'unparsed': 0}
+        
+        # Barge-in state: TTS activity, the last volume and play state we saw, the
+        # volume to restore, and command outcomes split by whether the music was
+        # ducked while capturing
+        self._tts_speaking = False
+        self._tts_queue = queue.Queue()
+        self._tts_thread = None
+        self._last_volume = None
+        self._music_playing = None
+        self._duck_thread = None
+        self._ducked_volume = None
+        self.capture_ducked = False
+        self._command_timed_out = False
+        self._last_failed_attempt = None
+        self.barge_in_stats = {
+            'ducked': {'commands': 0, 'not_understood': 0, 'retries': 0},
+            'not_ducked': {'commands': 0, 'not_understood': 0, 'retries': 0},
+        }
+        
+        # Microphone watchdog state
+        self.mic_device_names = []
+        self.known_good_mics = []
+        self.mic_recovery_times = []
+        self._mic_error = None
+        self._mic_failed_at = None
+        self._silent_since = None
+        self._last_device_poll = 0.0
+        
+        # Command history for predictive prefetch; the scheduler runs while listening
+        self.usage_history = UsageHistory(PREFETCH_HISTORY_PATH) if PREFETCH_ENABLED else None
+        self.prefetcher = None
+        self._handling_command = False
+        
+        # Persistent cache for search / top tracks / playlist tracks
+        if CACHE_ENABLED and cache_path:
+            try:
+                self.catalog_cache = CatalogCache(cache_path, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_TTLS)
+            except Exception as e:
+                print(f"⚠️ Catalog cache disabled: {e}")
+        
+        # Without audio the assistant can still run commands (used by benchmark.py)
+        if not enable_audio:
+            return
         
         # Configure TTS
         self.tts_engine.setProperty('rate', TTS_RATE)
@@ -36,8 +142,12 @@ class SpotifyAssistant:
                 scope=scope
             )
             
-            self.spotify = spotipy.Spotify(auth_manager=auth_manager)
+            self.spotify = spotipy.Spotify(auth_manager=auth_manager,
+                                           requests_session=self.connections.spotify_session)
             print("Spotify authentication successful!")
+            
+            if VOICE_SHORTCUTS:
+                self.resolve_shortcuts(VOICE_SHORTCUTS)
             return True
         except Exception as e:
             print(f"Authentication failed: {str(e)}")
@@ -56,25 +166,11 @@ class SpotifyAssistant:
             self.microphone = None
             return
         
-        # Look for common microphone names (prioritize Yeti first, then other microphones)
-        preferred_mics = []
-        yeti_mics = []
-        
-        for i, name in enumerate(mic_list):
-            name_lower = name.lower()
-            if 'yeti' in name_lower:
-                yeti_mics.append((i, name))  # Highest priority for Yeti microphones
-            elif any(keyword in name_lower for keyword in ['microphone', 'mic', 'blue', 'audio-technica', 'shure', 'rode']):
-                if 'microphone' in name_lower and 'stereo' not in name_lower:
-                    preferred_mics.insert(0, (i, name))  # Prioritize non-stereo microphones
-                else:
-                    preferred_mics.append((i, name))
-        
-        # Combine lists with Yeti microphones first
-        preferred_mics = yeti_mics + preferred_mics
+        self.mic_device_names = mic_list
+        self._last_device_poll = time.time()
         
         # Try preferred microphones first
-        for device_index, device_name in preferred_mics:
+        for device_index, device_name in self._rank_microphones(mic_list):
             if self._test_microphone(device_index, device_name):
                 return
         
@@ -92,20 +188,45 @@ class SpotifyAssistant:
         print("❌ No working microphone found!")
         self.microphone = None
     
-    def _test_microphone(self, device_index, device_name):
+    def _rank_microphones(self, mic_list):
+        """Order device (index, name) pairs by how likely they are to be a good microphone"""
+        # Look for common microphone names (prioritize Yeti first, then other microphones)
+        preferred_mics = []
+        yeti_mics = []
+        
+        for i, name in enumerate(mic_list):
+            name_lower = name.lower()
+            if 'yeti' in name_lower:
+                yeti_mics.append((i, name))  # Highest priority for Yeti microphones
+            elif any(keyword in name_lower for keyword in ['microphone', 'mic', 'blue', 'audio-technica', 'shure', 'rode']):
+                if 'microphone' in name_lower and 'stereo' not in name_lower:
+                    preferred_mics.insert(0, (i, name))  # Prioritize non-stereo microphones
+                else:
+                    preferred_mics.append((i, name))
+        
+        # Combine lists with Yeti microphones first
+        return yeti_mics + preferred_mics
+    
+    def _test_microphone(self, device_index, device_name, duration=0.5):
         """Test if a specific microphone works"""
         try:
             print(f"Testing: {device_name}")
-            if device_index is None:
-                test_mic = sr.Microphone()
-            else:
-                test_mic = sr.Microphone(device_index=device_index)
+            test_mic = self._create_microphone(device_index)
             
             # Quick test
-            with test_mic as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            try:
+                with test_mic as source:
+                    self._adjust_for_ambient_noise(source, duration=duration)
+            except Exception:
+                if isinstance(test_mic, WorkerMicrophone):
+                    test_mic.close()
+                raise
             
+            self._release_microphone()
             self.microphone = test_mic
+            self.microphone_name = device_name
+            if device_name not in self.known_good_mics:
+                self.known_good_mics.append(device_name)
             print(f"✅ Successfully using: {device_name}")
             return True
             
@@ -113,23 +234,278 @@ class SpotifyAssistant:
             print(f"❌ Failed: {str(e)[:50]}...")
             return False
     
+    def _create_microphone(self, device_index):
+        """Create an audio source for a device, captured in a worker process if enabled"""
+        if AUDIO_WORKER_ENABLED:
+            return WorkerMicrophone(device_index=device_index, sample_rate=AUDIO_WORKER_SAMPLE_RATE)
+        if device_index is None:
+            return sr.Microphone()
+        return sr.Microphone(device_index=device_index)
+    
+    def _adjust_for_ambient_noise(self, source, duration: float):
+        """Calibrate the energy threshold, from the capture worker's energies when there is one"""
+        if isinstance(source, WorkerMicrophone):
+            source.adjust_for_ambient_noise(self.recognizer, duration=duration)
+        else:
+            self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+    
+    def _listen(self, source, timeout: Optional[float], phrase_time_limit: Optional[float]):
+        """Record a phrase, detecting speech from the capture worker's energies when there is one"""
+        if isinstance(source, WorkerMicrophone):
+            return source.listen(self.recognizer, timeout=timeout, phrase_time_limit=phrase_time_limit)
+        return self.recognizer.listen(source, timeout=timeout, phrase_time_limit=phrase_time_limit)
+    
+    def _release_microphone(self):
+        """Stop the current microphone's capture worker, if it has one"""
+        if isinstance(self.microphone, WorkerMicrophone):
+            self.microphone.close()
+        self.microphone = None
+    
+    def check_microphone_health(self):
+        """Watchdog: pick up device hot-plug events and fail over from a broken or silent microphone"""
+        if not MIC_WATCHDOG_ENABLED:
+            return
+        
+        if time.time() - self._last_device_poll >= MIC_HOTPLUG_POLL_INTERVAL:
+            self._poll_microphone_devices()
+        
+        if self._mic_error:
+            reason = self._mic_error
+            self._mic_error = None
+            self._fail_over_microphone(reason)
+        elif self._silent_since and time.time() - self._silent_since >= MIC_SILENCE_TIMEOUT:
+            # The device went dead when the silence started, not when we noticed
+            if self._mic_failed_at is None:
+                self._mic_failed_at = self._silent_since
+            self._silent_since = None
+            self._fail_over_microphone(f"no signal for {MIC_SILENCE_TIMEOUT}s")
+    
+    def _report_microphone_error(self, reason: str):
+        """Flag the current microphone as broken for the watchdog, remembering when it was first seen failing"""
+        self._mic_error = reason
+        if self._mic_failed_at is None:
+            self._mic_failed_at = time.time()
+    
+    def _note_microphone_signal(self, frame_data: bytes):
+        """Track stretches of pure digital silence, which a dead device produces"""
+        if frame_data.strip(b'\x00'):
+            self._silent_since = None
+        elif self._silent_since is None:
+            self._silent_since = time.time()
+    
+    def _poll_microphone_devices(self):
+        """Re-list audio devices and react to devices being plugged in or removed"""
+        self._last_device_poll = time.time()
+        try:
+            mic_list = sr.Microphone.list_microphone_names()
+        except Exception as e:
+            print(f"❌ Failed to list microphones: {e}")
+            return
+        
+        # Keep retrying while we have no microphone at all
+        if self.microphone is None:
+            self.mic_device_names = mic_list
+            self._report_microphone_error("no microphone")
+            return
+        
+        if mic_list == self.mic_device_names:
+            return
+        
+        added = [name for name in mic_list if name not in self.mic_device_names]
+        removed = [name for name in self.mic_device_names if name not in mic_list]
+        self.mic_device_names = mic_list
+        print(f"🔌 Audio devices changed: {len(added)} added, {len(removed)} removed")
+        
+        if self.microphone_name in removed:
+            self._report_microphone_error("device removed")
+            return
+        
+        # Device indexes shift when devices come and go, so re-point the current microphone
+        # (a capture worker keeps its stream open on the original device, so it needs nothing).
+        # Several host APIs can list the same name, so use the first index that actually works.
+        if self.microphone_name != "Default" and not isinstance(self.microphone, WorkerMicrophone):
+            current_name = self.microphone_name
+            indexes = [i for i, name in enumerate(mic_list) if name == current_name]
+            if not any(self._test_microphone(i, current_name, duration=0.2) for i in indexes):
+                self._report_microphone_error("device moved and no longer works")
+                return
+        
+        # Switch to a newly plugged in microphone if it ranks above the current one
+        for device_index, device_name in self._rank_microphones(mic_list):
+            if device_name == self.microphone_name:
+                break
+            if device_name in added and self._test_microphone(device_index, device_name, duration=0.2):
+                return
+    
+    def _fail_over_microphone(self, reason: str) -> bool:
+        """Switch to the next working device, trying known-good devices before untested ones"""
+        # Time to recover counts from when the failure was first seen, across retries
+        started = self._mic_failed_at or time.time()
+        self._mic_failed_at = started
+        failed_name = self.microphone_name
+        print(f"⚠️ Microphone problem ({reason}), looking for another device...")
+        self._release_microphone()
+        
+        try:
+            mic_list = sr.Microphone.list_microphone_names()
+        except Exception as e:
+            print(f"❌ Failed to list microphones: {e}")
+            return False
+        self.mic_device_names = mic_list
+        
+        # Use the first index for names listed by several host APIs
+        index_by_name = {}
+        for i, name in enumerate(mic_list):
+            index_by_name.setdefault(name, i)
+        
+        # Known-good devices first, then the usual ranking, then the default device
+        names = [name for name in self.known_good_mics if name != failed_name and name in index_by_name]
+        names += [name for _, name in self._rank_microphones(mic_list) if name != failed_name and name not in names]
+        candidates = [(index_by_name[name], name) for name in names]
+        if failed_name != "Default":
+            candidates.append((None, "Default"))
+        # The failed device itself goes last, in case the error was transient
+        if failed_name in index_by_name:
+            candidates.append((index_by_name[failed_name], failed_name))
+        elif failed_name == "Default":
+            candidates.append((None, "Default"))
+        
+        for device_index, device_name in candidates:
+            if self._test_microphone(device_index, device_name, duration=0.2):
+                recovery_time = time.time() - started
+                self.mic_recovery_times.append(recovery_time)
+                self._mic_failed_at = None
+                print(f"✅ Microphone recovered in {recovery_time:.2f}s")
+                return True
+        
+        print("❌ No working microphone found! Waiting for a device to be connected...")
+        return False
+    
     def speak(self, text: str):
         """Speak text using TTS engine and also print it"""
         print(f"Assistant: {text}")
         
         # Only use TTS if enabled in config
-        if hasattr(globals(), 'TTS_ENABLED') and TTS_ENABLED:
+        if self.tts_engine is not None and TTS_ENABLED:
+            # Speak from one background thread so we don't block, and so
+            # runAndWait never runs twice at once (pyttsx3 only allows one loop)
+            if self._tts_thread is None:
+                self._tts_thread = threading.Thread(target=self._tts_loop, name='tts', daemon=True)
+                self._tts_thread.start()
+            self._tts_speaking = True
+            self._tts_queue.put(text)
+    
+    def _tts_loop(self):
+        """Speak queued text, one utterance at a time"""
+        while True:
+            text = self._tts_queue.get()
             try:
-                # Use TTS in a separate thread to avoid blocking
-                def speak_async():
-                    self.tts_engine.say(text)
-                    self.tts_engine.runAndWait()
-                
-                # Run TTS in background thread
-                tts_thread = threading.Thread(target=speak_async, daemon=True)
-                tts_thread.start()
+                self.tts_engine.say(text)
+                self.tts_engine.runAndWait()
             except Exception as e:
                 print(f"TTS Error: {e}")
+            finally:
+                if self._tts_queue.empty():
+                    self._tts_speaking = False
+    
+    def stop_speaking(self):
+        """Cut off any TTS that is still playing or waiting to be spoken"""
+        if self.tts_engine is not None and self._tts_speaking:
+            try:
+                while True:
+                    self._tts_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.tts_engine.stop()
+            except Exception as e:
+                print(f"TTS Error: {e}")
+    
+    def begin_barge_in(self):
+        """Stop TTS and duck Spotify so the command isn't drowned out by our own output
+        
+        The volume call runs in the background so capture can start at once;
+        capture_ducked says whether the volume was actually lowered.
+        """
+        self.stop_speaking()
+        self.capture_ducked = False
+        if self.spotify is None:
+            return
+        
+        self._duck_thread = threading.Thread(target=self._duck_volume, daemon=True)
+        self._duck_thread.start()
+    
+    def _duck_volume(self):
+        """Lower the volume with a single volume call, based on the last volume we saw"""
+        try:
+            if not self._music_playing or self._last_volume is None:
+                # Not known to be playing (or never seen), so check the state fetched on the wake word
+                self._note_playback(self.get_player_state('current_playback'))
+                if not self._music_playing:
+                    return
+            volume = self._last_volume
+            if volume is None or volume <= BARGE_IN_DUCK_VOLUME:
+                return
+            
+            self.spotify.volume(BARGE_IN_DUCK_VOLUME)
+            self._ducked_volume = volume
+            self.capture_ducked = True
+        except Exception as e:
+            print(f"⚠️ Could not lower the volume: {str(e)}")
+    
+    def end_barge_in(self):
+        """Restore the volume lowered by begin_barge_in"""
+        if self._duck_thread is not None:
+            # Restoring before the duck lands would leave the music quiet
+            self._duck_thread.join()
+            self._duck_thread = None
+        if self._ducked_volume is None:
+            return
+        volume = self._ducked_volume
+        self._ducked_volume = None
+        
+        # The volume may have been changed elsewhere since we last saw it; if the
+        # wake-word fetch has finished, restore to what it found instead
+        try:
+            playback = self.connections.result('current_playback', timeout=0)
+            fresh = playback['device']['volume_percent'] if playback and playback.get('device') else None
+            if fresh is not None and fresh != BARGE_IN_DUCK_VOLUME:
+                volume = fresh
+        except KeyError:
+            pass
+        
+        try:
+            self.spotify.volume(volume)
+            self._last_volume = volume
+        except Exception as e:
+            print(f"⚠️ Could not restore the volume: {str(e)}")
+    
+    def _note_playback(self, playback):
+        """Remember the play state and volume from a current_playback() response"""
+        if not playback:
+            self._music_playing = False
+            return
+        self._music_playing = playback['is_playing']
+        if playback.get('device') and playback['device'].get('volume_percent') is not None:
+            self._last_volume = playback['device']['volume_percent']
+    
+    def _record_command_outcome(self, ducked: bool, understood: bool):
+        """Count not-understood commands and quick retries after them"""
+        now = time.time()
+        
+        # A wake shortly after a failed attempt means the user had to repeat themselves
+        if self._last_failed_attempt:
+            failed_at, failed_ducked = self._last_failed_attempt
+            if now - failed_at <= BARGE_IN_RETRY_WINDOW:
+                self.barge_in_stats['ducked' if failed_ducked else 'not_ducked']['retries'] += 1
+        
+        stats = self.barge_in_stats['ducked' if ducked else 'not_ducked']
+        stats['commands'] += 1
+        if understood:
+            self._last_failed_attempt = None
+        else:
+            stats['not_understood'] += 1
+            self._last_failed_attempt = (now, ducked)
     
     def wait_for_wake_word(self) -> bool:
         """Wait specifically for the wake word 'spotify'"""
@@ -140,19 +516,27 @@ class SpotifyAssistant:
         try:
             with self.microphone as source:
                 # Minimal ambient noise adjustment for faster response
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.1)
+                self._adjust_for_ambient_noise(source, duration=0.1)
                 
                 # Optimize energy threshold for better wake word detection
                 self.recognizer.energy_threshold = 250
                 self.recognizer.dynamic_energy_threshold = True
                 
                 # Reduced timeout for more responsive wake word detection
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=2)
-                command = self.recognizer.recognize_google(audio).lower()
+                try:
+                    audio = self._listen(source, timeout=5, phrase_time_limit=2)
+                except sr.WaitTimeoutError:
+                    # Sample the stream so the watchdog can spot a dead device
+                    self._note_microphone_signal(source.stream.read(source.CHUNK))
+                    raise
+                self._note_microphone_signal(audio.frame_data)
+                command = self.connections.recognize_google(audio).lower()
                 
                 if "spotify" in command:
                     print("✅ Spotify activated! What would you like me to do?")
-                    self.speak("Spotify activated! What would you like me to do?")
+                    # With barge-in the spoken prompt would leak into the command capture
+                    if not BARGE_IN_ENABLED:
+                        self.speak("Spotify activated! What would you like me to do?")
                     return True
                 else:
                     print(f"Heard: '{command}' - Please say 'Spotify' to activate.")
@@ -167,12 +551,18 @@ class SpotifyAssistant:
         except sr.RequestError as e:
             print(f"Speech recognition error: {e}")
             return False
-        except Exception as e:
+        except OSError as e:
+            # Stream errors mean the device itself is in trouble
             print(f"Microphone error: {str(e)}")
+            self._report_microphone_error(str(e))
+            return False
+        except Exception as e:
+            print(f"Wake word detection error: {str(e)}")
             return False
     
     def listen_for_command(self) -> Optional[str]:
         """Listen for voice commands after wake word is detected"""
+        self._command_timed_out = False
         if self.microphone is None:
             print("No microphone available. Please check your microphone setup.")
             return None
@@ -180,20 +570,29 @@ class SpotifyAssistant:
         try:
             with self.microphone as source:
                 # Reduced ambient noise adjustment for faster response
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.2)
+                self._adjust_for_ambient_noise(source, duration=0.2)
                 print("🎤 Listening for your command...")
                 
                 # Set energy threshold for better sensitivity
                 self.recognizer.energy_threshold = 300
                 self.recognizer.dynamic_energy_threshold = True
                 
-                audio = self.recognizer.listen(source, timeout=VOICE_TIMEOUT, phrase_time_limit=VOICE_PHRASE_LIMIT)
-                command = self.recognizer.recognize_google(audio).lower()
+                try:
+                    audio = self._listen(source, timeout=VOICE_TIMEOUT, phrase_time_limit=VOICE_PHRASE_LIMIT)
+                finally:
+                    # Capture is done, bring the music back before recognition
+                    self.end_barge_in()
+                
+                if STT_NBEST_ENABLED:
+                    command = self.choose_transcript(self.recognize_alternatives(audio))
+                else:
+                    command = self.connections.recognize_google(audio).lower()
                 print(f"✅ Command received: {command}")
                 return command
                     
         except sr.WaitTimeoutError:
             print("⏰ No command heard, going back to wake word detection...")
+            self._command_timed_out = True
             return None
         except sr.UnknownValueError:
             print("❓ Sorry, I didn't understand that command. Please speak clearly.")
@@ -201,14 +600,180 @@ class SpotifyAssistant:
         except sr.RequestError as e:
             print(f"🌐 Could not request results; {e}")
             return None
-        except Exception as e:
+        except OSError as e:
+            # Stream errors mean the device itself is in trouble
             print(f"🎤 Microphone error: {str(e)}")
+            self._report_microphone_error(str(e))
+            return None
+        except Exception as e:
+            print(f"❌ Command recognition error: {str(e)}")
+            return None
+    
+    def recognize_alternatives(self, audio) -> List[Tuple[str, Optional[float]]]:
+        """Return every (transcript, confidence) hypothesis Google offers for the audio"""
+        result = self.connections.recognize_google(audio, show_all=True)
+        if not isinstance(result, dict) or not result.get('alternative'):
+            raise sr.UnknownValueError()
+        # Google usually only gives a confidence for the top hypothesis
+        return [(alternative['transcript'].lower(), alternative.get('confidence'))
+                for alternative in result['alternative'] if 'transcript' in alternative]
+    
+    def score_transcript(self, transcript: str, confidence: Optional[float], rank: int) -> Optional[float]:
+        """Score a hypothesis by how well it fits the command grammar and known names
+        
+        Returns None if it doesn't parse as a command at all.
+        """
+        intent, argument = self.parse_command(transcript)
+        if intent is None:
             return None
+        
+        # A recognizer confidence when we have one, otherwise a penalty for lower ranks
+        score = confidence if confidence is not None else max(0.0, 0.8 - 0.05 * rank)
+        
+        # Complete commands beat ones with a missing or invalid argument
+        score += 1.0 if self._is_complete(intent, argument) else 0.2
+        
+        if intent == 'play_shortcut':
+            score += 0.5
+        elif intent in ('play_playlist', 'play_artist', 'search_and_play') and argument and self.known_entities:
+            # Reward names we've played before or pinned as shortcuts
+            best = max(SequenceMatcher(None, argument, name).ratio() for name in self.known_entities)
+            score += best
+        
+        return score
+    
+    @staticmethod
+    def _is_complete(intent: Optional[str], argument) -> bool:
+        """Whether a parsed command can run as-is, i.e. isn't missing or out of range in its argument"""
+        if intent is None:
+            return False
+        if intent in MISSING_ARGUMENT_MESSAGES and argument is None:
+            return False
+        return not (intent == 'set_volume' and not 0 <= argument <= 100)
+    
+    def choose_transcript(self, alternatives: List[Tuple[str, Optional[float]]]) -> str:
+        """Pick the top hypothesis if it's a complete command, else the best-scoring one that parses
+        
+        Only the top hypothesis comes with a recognizer confidence, so scores
+        of the top and the alternatives aren't comparable; alternatives are
+        only considered when the top one wouldn't work as a command.
+        """
+        self.nbest_stats['commands'] += 1
+        if self._is_complete(*self.parse_command(alternatives[0][0])):
+            return alternatives[0][0]
+        
+        scored = []
+        for rank, (transcript, confidence) in enumerate(alternatives):
+            score = self.score_transcript(transcript, confidence, rank)
+            print(f"   n-best #{rank}: {transcript!r} score={'-' if score is None else f'{score:.2f}'}")
+            if score is not None:
+                scored.append((score, -rank, transcript))
+        
+        top = alternatives[0][0]
+        if not scored:
+            self.nbest_stats['unparsed'] += 1
+            return top
+        
+        best = max(scored)[2]
+        if best != top:
+            self.nbest_stats['reranked'] += 1
+            if self.parse_command(top)[0] is None:
+                # The top hypothesis alone would have been "Sorry, I don't understand"
+                self.nbest_stats['rescued'] += 1
+                print(f"🛟 Rescued command using alternative {best!r}")
+        return best
+    
+    def cached_search(self, query: str, search_type: str, limit: int):
+        """Search Spotify, answering from the catalog cache when possible"""
+        def load():
+            return self.spotify.search(q=query, type=search_type, limit=limit)
+        
+        if self.catalog_cache is None:
+            return load()
+        endpoint = 'playlist_search' if search_type == 'playlist' else 'search'
+        key = CatalogCache.make_key(endpoint, search_type, limit, ' '.join(query.lower().split()))
+        return self.catalog_cache.fetch(endpoint, key, load)
+    
+    def cached_artist_top_tracks(self, artist_uri: str):
+        """Get an artist's top tracks, answering from the catalog cache when possible"""
+        def load():
+            top_tracks = self.spotify.artist_top_tracks(artist_uri)
+            # Only keep the fields we use to keep cache entries small
+            return {'tracks': [{'uri': track['uri'], 'name': track['name']} for track in top_tracks['tracks']]}
+        
+        if self.catalog_cache is None:
+            return load()
+        key = CatalogCache.make_key('artist_top_tracks', artist_uri)
+        return self.catalog_cache.fetch('artist_top_tracks', key, load)
+    
+    def cached_playlist_tracks(self, playlist_uri: str, snapshot_id: Optional[str] = None):
+        """Get a playlist's tracks, revalidated against the playlist's snapshot_id"""
+        def load():
+            return self.spotify.playlist_tracks(playlist_uri, fields='items(track(uri,name,artists(name)))')
+        
+        # Without a snapshot_id we can't tell if the playlist changed, so don't cache
+        if self.catalog_cache is None or not snapshot_id:
+            return load()
+        key = CatalogCache.make_key('playlist_tracks', playlist_uri, snapshot_id)
+        return self.catalog_cache.fetch('playlist_tracks', key, load)
+    
+    def cached_saved_tracks(self):
+        """Get the URIs of the user's 50 most recently liked songs, answering from the catalog cache when possible"""
+        def load():
+            liked_tracks = self.spotify.current_user_saved_tracks(limit=50)
+            return {'uris': [item['track']['uri'] for item in liked_tracks['items']]}
+        
+        if self.catalog_cache is None:
+            return load()
+        return self.catalog_cache.fetch('saved_tracks', CatalogCache.make_key('saved_tracks'), load)
+    
+    def prefetch_intent(self, intent: str, target: Optional[str], max_requests: Optional[int] = None) -> int:
+        """Resolve a predicted command's lookups into the catalog cache without playing anything
+        
+        Sends at most max_requests HTTP requests, counting the session's retries,
+        and returns how many were sent.
+        """
+        cache = self.catalog_cache
+        with self.connections.counting_requests(max_requests) as counted, cache.prefetching():
+            try:
+                self._prefetch_lookups(intent, target)
+            except RequestLimitReached:
+                pass
+            except Exception as e:
+                # Requests sent before the failure still count against the budget
+                print(f"⚠️ Prefetch of {intent} failed: {str(e)}")
+        return counted['requests']
+    
+    def _prefetch_lookups(self, intent: str, target: Optional[str]):
+        """Run the cached lookups the intent's handler will need"""
+        if intent == 'play_playlist' and target:
+            items = self.cached_search(target, 'playlist', 5)['playlists']['items']
+            if items:
+                # Same choice play_playlist makes
+                playlist = next((p for p in items if target.lower() in p['name'].lower()), items[0])
+                if playlist.get('snapshot_id'):
+                    self.cached_playlist_tracks(playlist['uri'], playlist['snapshot_id'])
+        elif intent == 'play_artist' and target:
+            items = self.cached_search(f'artist:{target}', 'artist', 1)['artists']['items']
+            if items:
+                self.cached_artist_top_tracks(items[0]['uri'])
+        elif intent == 'play_liked_songs':
+            self.cached_saved_tracks()
+    
+    def get_player_state(self, name: str):
+        """Return devices() or current_playback(), reusing the fetch started on the wake word if there is one"""
+        try:
+            state = self.connections.result(name)
+        except KeyError:
+            state = getattr(self.spotify, name)()
+        if name == 'current_playback':
+            self._note_playback(state)
+        return state
     
     def get_available_devices(self):
         """Get list of available Spotify devices"""
         try:
-            devices = self.spotify.devices()
+            devices = self.get_player_state('devices')
             return devices['devices']
         except Exception as e:
             print(f"Failed to get devices: {str(e)}")
@@ -311,6 +876,7 @@ class SpotifyAssistant:
         """Set playback volume (0-100)"""
         try:
             self.spotify.volume(volume_percent)
+            self._last_volume = volume_percent
             self.speak(f"Volume set to {volume_percent}%")
         except Exception as e:
             self.speak(f"Failed to set volume: {str(e)}")
@@ -350,7 +916,7 @@ class SpotifyAssistant:
     def what_song(self):
         """Get current playing song info"""
         try:
-            current = self.spotify.current_playback()
+            current = self.get_player_state('current_playback')
             if current and current['is_playing']:
                 track = current['item']
                 track_name = track['name']
@@ -365,15 +931,16 @@ class SpotifyAssistant:
     def play_artist(self, artist_name: str):
         """Play popular songs by an artist"""
         try:
-            results = self.spotify.search(q=f'artist:{artist_name}', type='artist', limit=1)
+            results = self.cached_search(f'artist:{artist_name}', 'artist', 1)
             
             if results['artists']['items']:
                 artist = results['artists']['items'][0]
                 artist_uri = artist['uri']
                 artist_name_found = artist['name']
+                self.known_entities.add(artist_name_found.lower())
                 
                 # Get top tracks for the artist
-                top_tracks = self.spotify.artist_top_tracks(artist_uri)
+                top_tracks = self.cached_artist_top_tracks(artist_uri)
                 if top_tracks['tracks']:
                     track_uris = [track['uri'] for track in top_tracks['tracks'][:10]]  # Top 10 tracks
                     try:
@@ -403,10 +970,12 @@ class SpotifyAssistant:
     def like_song(self):
         """Like/save the current song"""
         try:
-            current = self.spotify.current_playback()
+            current = self.get_player_state('current_playback')
             if current and current['item']:
                 track_id = current['item']['id']
                 self.spotify.current_user_saved_tracks_add([track_id])
+                if self.catalog_cache is not None:
+                    self.catalog_cache.delete(CatalogCache.make_key('saved_tracks'))
                 track_name = current['item']['name']
                 self.speak(f"Liked: {track_name}")
             else:
@@ -417,9 +986,8 @@ class SpotifyAssistant:
     def play_liked_songs(self):
         """Play user's liked songs"""
         try:
-            liked_tracks = self.spotify.current_user_saved_tracks(limit=50)
-            if liked_tracks['items']:
-                track_uris = [item['track']['uri'] for item in liked_tracks['items']]
+            track_uris = self.cached_saved_tracks()['uris']
+            if track_uris:
                 self.spotify.start_playback(uris=track_uris)
                 self.speak("Playing your liked songs")
             else:
@@ -437,6 +1005,7 @@ class SpotifyAssistant:
                 track_uri = track['uri']
                 track_name = track['name']
                 artist_name = track['artists'][0]['name']
+                self.known_entities.update((track_name.lower(), artist_name.lower()))
                 
                 try:
                     self.spotify.start_playback(uris=[track_uri])
@@ -463,7 +1032,7 @@ class SpotifyAssistant:
     def play_playlist(self, playlist_name: str):
         """Search and play a playlist"""
         try:
-            results = self.spotify.search(q=playlist_name, type='playlist', limit=5)
+            results = self.cached_search(playlist_name, 'playlist', 5)
             
             if results['playlists']['items']:
                 # Find the best match
@@ -471,9 +1040,10 @@ class SpotifyAssistant:
                     if playlist_name.lower() in playlist['name'].lower():
                         playlist_uri = playlist['uri']
                         playlist_name_found = playlist['name']
+                        self.known_entities.add(playlist_name_found.lower())
                         
                         # Get playlist tracks for numbering
-                        tracks = self.spotify.playlist_tracks(playlist_uri)
+                        tracks = self.cached_playlist_tracks(playlist_uri, playlist.get('snapshot_id'))
                         self.current_playlist_tracks = tracks['items']
                         
                         self.spotify.start_playback(context_uri=playlist_uri)
@@ -484,8 +1054,9 @@ class SpotifyAssistant:
                 playlist = results['playlists']['items'][0]
                 playlist_uri = playlist['uri']
                 playlist_name_found = playlist['name']
+                self.known_entities.add(playlist_name_found.lower())
                 
-                tracks = self.spotify.playlist_tracks(playlist_uri)
+                tracks = self.cached_playlist_tracks(playlist_uri, playlist.get('snapshot_id'))
                 self.current_playlist_tracks = tracks['items']
                 
                 self.spotify.start_playback(context_uri=playlist_uri)
@@ -517,104 +1088,293 @@ class SpotifyAssistant:
         except Exception as e:
             print(f"Failed to play track number {track_number}: {str(e)}")
     
-    def process_command(self, command: str):
-        """Process voice commands"""
-        command = command.lower().strip()
+    def validate_shortcuts(self, shortcuts: Dict) -> Dict[str, Dict]:
+        """Check the shortcuts table and normalize every entry to {'type', 'uri'} or {'type', 'search'}"""
+        valid = {}
+        for phrase, target in shortcuts.items():
+            phrase = ' '.join(str(phrase).lower().split())
+            
+            if isinstance(target, str):
+                match = SHORTCUT_URI_PATTERN.match(target) or SHORTCUT_URL_PATTERN.match(target)
+                if not match:
+                    print(f"⚠️ Shortcut '{phrase}': '{target}' is not a Spotify track, album, artist or playlist URI")
+                    continue
+                valid[phrase] = {'type': match.group(1), 'uri': f"spotify:{match.group(1)}:{match.group(2)}"}
+            
+            elif isinstance(target, dict) and target.get('search'):
+                search_type = target.get('type', 'track')
+                if search_type not in SHORTCUT_TYPES:
+                    print(f"⚠️ Shortcut '{phrase}': unsupported search type '{search_type}'")
+                    continue
+                valid[phrase] = {'type': search_type, 'search': target['search']}
+            
+            else:
+                print(f"⚠️ Shortcut '{phrase}': expected a Spotify URI or {{'search': ..., 'type': ...}}")
+        
+        return valid
+    
+    def resolve_shortcuts(self, shortcuts: Dict):
+        """Resolve voice shortcuts to playable URIs up front, so using one costs a single start_playback call"""
+        entries = self.validate_shortcuts(shortcuts)
+        resolved = {}
+        
+        # Saved searches become URIs (answered from the catalog cache after the first run)
+        for phrase, entry in entries.items():
+            if 'search' not in entry:
+                continue
+            try:
+                results = self.cached_search(entry['search'], entry['type'], 1)
+                items = results[entry['type'] + 's']['items']
+                if items and items[0]:
+                    entry['uri'] = items[0]['uri']
+                    entry['label'] = items[0]['name']
+                    entry['snapshot_id'] = items[0].get('snapshot_id')
+                else:
+                    print(f"⚠️ Shortcut '{phrase}': nothing found for '{entry['search']}'")
+            except Exception as e:
+                print(f"⚠️ Shortcut '{phrase}': search failed: {str(e)}")
+        
+        # Look up names for pinned URIs in batches; this also confirms they exist
+        batch_lookups = {
+            'track': (self.spotify.tracks, 'tracks', 50),
+            'artist': (self.spotify.artists, 'artists', 50),
+            'album': (self.spotify.albums, 'albums', 20),
+        }
+        for uri_type, (lookup, key, batch_size) in batch_lookups.items():
+            pinned = [entry for entry in entries.values()
+                      if entry['type'] == uri_type and 'uri' in entry and 'label' not in entry]
+            for start in range(0, len(pinned), batch_size):
+                batch = pinned[start:start + batch_size]
+                try:
+                    found = lookup([entry['uri'] for entry in batch])[key]
+                except Exception as e:
+                    print(f"⚠️ Failed to look up {uri_type} shortcuts: {str(e)}")
+                    continue
+                for entry, item in zip(batch, found):
+                    if item:
+                        entry['label'] = item['name']
+        
+        # Playlists have no batch endpoint, so fetch just their name and snapshot
+        for entry in entries.values():
+            if entry['type'] == 'playlist' and 'uri' in entry and 'label' not in entry:
+                try:
+                    playlist = self.spotify.playlist(entry['uri'], fields='name,snapshot_id')
+                    entry['label'] = playlist['name']
+                    entry['snapshot_id'] = playlist.get('snapshot_id')
+                except Exception as e:
+                    print(f"⚠️ Failed to look up playlist {entry['uri']}: {str(e)}")
+        
+        # Prefetch tracks so playing a shortcut needs nothing but start_playback
+        for phrase, entry in entries.items():
+            if 'label' not in entry:
+                print(f"⚠️ Shortcut '{phrase}' could not be resolved and will be ignored")
+                continue
+            self.known_entities.add(entry['label'].lower())
+            try:
+                if entry['type'] == 'artist':
+                    top_tracks = self.cached_artist_top_tracks(entry['uri'])
+                    resolved[phrase] = {'label': f"top songs by {entry['label']}",
+                                        'uris': [track['uri'] for track in top_tracks['tracks'][:10]]}
+                elif entry['type'] == 'playlist':
+                    tracks = self.cached_playlist_tracks(entry['uri'], entry.get('snapshot_id'))
+                    resolved[phrase] = {'label': f"playlist {entry['label']}", 'context_uri': entry['uri'],
+                                        'tracks': tracks['items']}
+                elif entry['type'] == 'album':
+                    resolved[phrase] = {'label': f"album {entry['label']}", 'context_uri': entry['uri']}
+                else:
+                    resolved[phrase] = {'label': entry['label'], 'uris': [entry['uri']]}
+            except Exception as e:
+                print(f"⚠️ Shortcut '{phrase}': failed to prefetch tracks: {str(e)}")
+        
+        self.shortcuts = resolved
+        print(f"✅ {len(resolved)} of {len(shortcuts)} voice shortcuts ready")
+    
+    def play_shortcut(self, shortcut: Dict):
+        """Play a resolved voice shortcut with a single start_playback call"""
+        if 'context_uri' in shortcut:
+            playback_args = {'context_uri': shortcut['context_uri']}
+        else:
+            playback_args = {'uris': shortcut['uris']}
+        
+        try:
+            self.spotify.start_playback(**playback_args)
+        except Exception as e:
+            if "No active device" in str(e) or "404" in str(e):
+                print("🔍 No active device found, searching for available devices...")
+                if not self.activate_device():
+                    self.speak("No device available to play music")
+                    return
+                try:
+                    self.spotify.start_playback(**playback_args)
+                except Exception:
+                    self.speak("Playback failed")
+                    return
+            else:
+                self.speak("Playback failed")
+                return
+        
+        if 'tracks' in shortcut:
+            self.current_playlist_tracks = shortcut['tracks']
+        self.speak(f"Playing {shortcut['label']}")
+    
+    def parse_command(self, command: str):
+        """Match a command against the command grammar
+        
+        Returns (intent, argument) where intent is the name of the method that
+        handles it, or (None, None) if the command isn't understood. The
+        argument is None when the command needs one but it's missing.
+        """
+        command = ' '.join(command.lower().split())
+        
+        # User-defined shortcuts take priority and skip the search round trip
+        shortcut = self.shortcuts.get(command)
+        if shortcut:
+            return 'play_shortcut', shortcut
+        
+        # Checked before the "play" / "stop" rules, which would otherwise swallow them. Only
+        # whole commands / leading phrases, so names like "exit music" still reach the play rules
+        if re.fullmatch(r'(?:quit|exit|stop listening)', command):
+            return 'stop_listening', None
+        
+        if re.match(r"(?:what song|current song|what's playing|what is playing)\b", command):
+            return 'what_song', None
         
         if "play" in command and "playlist" in command:
             # Extract playlist name
             playlist_match = re.search(r'play playlist (.+)', command)
-            if playlist_match:
-                playlist_name = playlist_match.group(1)
-                self.play_playlist(playlist_name)
-            else:
-                print("Please specify a playlist name")
+            return 'play_playlist', playlist_match.group(1) if playlist_match else None
         
-        elif "play track" in command or "play number" in command:
+        if "play track" in command or "play number" in command:
             # Extract track number
             number_match = re.search(r'(?:track|number)\s+(\d+)', command)
-            if number_match:
-                track_number = int(number_match.group(1))
-                self.play_track_number(track_number)
-            else:
-                print("Please specify a track number")
+            return 'play_track_number', int(number_match.group(1)) if number_match else None
         
-        elif "search" in command and "play" in command:
+        if "search" in command and "play" in command:
             # Extract search query
             search_match = re.search(r'search (?:and )?play (.+)', command)
-            if search_match:
-                query = search_match.group(1)
-                self.search_and_play(query)
-            else:
-                print("Please specify what to search for")
+            return 'search_and_play', search_match.group(1) if search_match else None
         
-        elif "play" in command:
+        if "play artist" in command:
+            # Extract artist name
+            artist_match = re.search(r'play artist (.+)', command)
+            return 'play_artist', artist_match.group(1) if artist_match else None
+        
+        if "play liked" in command or "play favorites" in command or "play saved" in command:
+            return 'play_liked_songs', None
+        
+        if "play" in command:
             if any(word in command for word in ["song", "music", "track"]):
                 # Extract song name
                 play_match = re.search(r'play (?:song |music |track )?(.+)', command)
-                if play_match:
-                    query = play_match.group(1)
-                    self.search_and_play(query)
-            else:
-                self.play_music()
+                return 'search_and_play', play_match.group(1) if play_match else None
+            return 'play_music', None
         
-        elif "pause" in command or "stop" in command:
-            self.pause_music()
+        if "pause" in command or "stop" in command:
+            return 'pause_music', None
         
-        elif "skip" in command or "next" in command:
-            self.skip_track()
+        if "skip" in command or "next" in command:
+            return 'skip_track', None
         
-        elif "previous" in command or "back" in command:
-            self.previous_track()
+        if "previous" in command or "back" in command:
+            return 'previous_track', None
         
-        elif "volume" in command:
+        if "volume" in command:
             # Extract volume level
             volume_match = re.search(r'volume\s+(\d+)', command)
-            if volume_match:
-                volume = int(volume_match.group(1))
-                if 0 <= volume <= 100:
-                    self.set_volume(volume)
-                else:
-                    print("Volume must be between 0 and 100")
-            else:
-                print("Please specify a volume level (0-100)")
+            return 'set_volume', int(volume_match.group(1)) if volume_match else None
         
-        elif "shuffle on" in command or "turn on shuffle" in command:
-            self.shuffle_on()
+        if "shuffle on" in command or "turn on shuffle" in command:
+            return 'shuffle_on', None
         
-        elif "shuffle off" in command or "turn off shuffle" in command:
-            self.shuffle_off()
+        if "shuffle off" in command or "turn off shuffle" in command:
+            return 'shuffle_off', None
         
-        elif "repeat" in command and "off" in command:
-            self.repeat_off()
+        if "repeat" in command and "off" in command:
+            return 'repeat_off', None
         
-        elif "repeat" in command:
-            self.repeat_track()
+        if "repeat" in command:
+            return 'repeat_track', None
         
-        elif "what song" in command or "current song" in command or "what's playing" in command:
-            self.what_song()
+        if "what song" in command or "current song" in command or "what's playing" in command:
+            return 'what_song', None
         
-        elif "play artist" in command:
-            # Extract artist name
-            artist_match = re.search(r'play artist (.+)', command)
-            if artist_match:
-                artist_name = artist_match.group(1)
-                self.play_artist(artist_name)
-            else:
-                print("Please specify an artist name")
+        if "like" in command or "save" in command:
+            return 'like_song', None
         
-        elif "like" in command or "save" in command:
-            self.like_song()
+        if "quit" in command or "exit" in command or "stop listening" in command:
+            return 'stop_listening', None
         
-        elif "play liked" in command or "play favorites" in command or "play saved" in command:
-            self.play_liked_songs()
+        return None, None
+    
+    def process_command(self, command: str):
+        """Process voice commands"""
+        intent, argument = self.parse_command(command)
         
-        elif "quit" in command or "exit" in command or "stop listening" in command:
-            print("Goodbye!")
-            self.is_listening = False
+        if intent is None:
+            print("Sorry, I don't understand that command. Available commands: play, pause, skip, previous, volume, shuffle, repeat, what song, play artist, like, play liked songs, or quit.")
+            return
         
+        if intent == 'play_shortcut':
+            # parse_command only returns this intent with a resolved shortcut
+            self.play_shortcut(argument)
+        elif intent in MISSING_ARGUMENT_MESSAGES:
+            if argument is None:
+                print(MISSING_ARGUMENT_MESSAGES[intent])
+                return
+            if intent == 'set_volume' and not 0 <= argument <= 100:
+                print("Volume must be between 0 and 100")
+                return
+            getattr(self, intent)(argument)
         else:
-            print("Sorry, I don't understand that command. Available commands: play, pause, skip, previous, volume, shuffle, repeat, what song, play artist, like, play liked songs, or quit.")
+            getattr(self, intent)()
+        
+        if intent in PLAYBACK_STARTING_INTENTS:
+            self._music_playing = True
+        elif intent == 'pause_music':
+            self._music_playing = False
+        
+        if self.usage_history is not None and intent != 'stop_listening':
+            target = argument if intent in HISTORY_TARGET_INTENTS else None
+            self.usage_history.record(intent, target.lower() if target else None)
+            if self.prefetcher is not None:
+                self.prefetcher.notify()
+    
+    def stop_listening(self):
+        """Leave the listening loop"""
+        print("Goodbye!")
+        self.is_listening = False
+    
+    def print_session_stats(self):
+        """Print performance counters collected during this session"""
+        if self.catalog_cache is not None:
+            stats = self.catalog_cache.stats()
+            print(f"📊 Catalog cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, {stats['bytes'] // 1024} KB")
+            if stats['prefetched']:
+                requests_sent = self.prefetcher.stats['calls'] if self.prefetcher is not None else stats['prefetch_loads']
+                print(f"📊 Prefetch: {stats['prefetched']} entries prefetched, {stats['prefetch_hits']} used "
+                      f"({stats['prefetch_hit_rate']:.0%} hit rate), {requests_sent} API requests")
+        if self.nbest_stats['commands']:
+            stats = self.nbest_stats
+            print(f"📊 STT alternatives: {stats['commands']} commands, {stats['reranked']} used a lower-ranked "
+                  f"hypothesis, {stats['rescued']} rescued from \"don't understand\", {stats['unparsed']} unparseable")
+        for mode, stats in self.barge_in_stats.items():
+            if stats['commands']:
+                print(f"📊 Commands {mode.replace('_', ' ')}: {stats['commands']}, "
+                      f"{stats['not_understood'] / stats['commands']:.0%} not understood, {stats['retries']} retries")
+        connections = self.connections.report()
+        if connections['warmups']:
+            print(f"📊 Pre-warming: {connections['warmups']} wakes, {connections['average_hidden_s'] * 1000:.0f} ms "
+                  f"of connection setup hidden per command on average")
+        if isinstance(self.microphone, WorkerMicrophone):
+            stats = self.microphone.stats()
+            cpu = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in stats['cpu_s'].items())
+            print(f"📊 Audio worker: {stats['frames']} frames, {stats['capture_overflows']} device overflows, "
+                  f"{stats['reader_overruns']} ring overruns; CPU {cpu}")
+        if self.mic_recovery_times:
+            average = sum(self.mic_recovery_times) / len(self.mic_recovery_times)
+            print(f"📊 Microphone recoveries: {len(self.mic_recovery_times)}, "
+                  f"average time to recover {average:.2f}s")
     
     def start_listening(self):
         """Start the voice command loop with wake word detection"""
@@ -624,18 +1384,54 @@ class SpotifyAssistant:
         print("Available commands: play, pause, skip, previous, volume, shuffle, repeat, what song, play artist, like, play liked songs, quit")
         print("\n🎤 Listening for wake word 'Spotify'...")
         
-        while self.is_listening:
-            # First wait for wake word
-            if self.wait_for_wake_word():
-                # Then listen for the actual command
-                command = self.listen_for_command()
-                if command:
-                    self.process_command(command)
-                    print("\n🎤 Say 'Spotify' again to give another command...")
-                else:
-                    print("\n🎤 Listening for wake word 'Spotify'...")
-            # Add a small delay to prevent excessive CPU usage
-            time.sleep(0.5)
+        # Pre-resolve likely next commands in the background
+        if self.usage_history is not None and self.catalog_cache is not None:
+            self.prefetcher = PrefetchScheduler(
+                self.usage_history, self.prefetch_intent, lambda: self._handling_command, PREFETCH_INTENTS,
+                call_budget=PREFETCH_CALL_BUDGET, interval=PREFETCH_INTERVAL,
+                max_predictions=PREFETCH_MAX_PREDICTIONS)
+            self.prefetcher.start()
+        
+        try:
+            while self.is_listening:
+                self.check_microphone_health()
+            
+                # First wait for wake word
+                if self.wait_for_wake_word():
+                    self._handling_command = True
+                    # Warm connections and fetch player state while the user is still talking
+                    if PREWARM_ENABLED:
+                        self.connections.start_warmup(self.spotify)
+                    if BARGE_IN_ENABLED:
+                        self.begin_barge_in()
+                
+                    # Then listen for the actual command
+                    command = self.listen_for_command()
+                    self.end_barge_in()
+                    if not self._command_timed_out:
+                        self._record_command_outcome(self.capture_ducked, bool(command) and self.parse_command(command)[0] is not None)
+                
+                    if command:
+                        self.process_command(command)
+                        print("\n🎤 Say 'Spotify' again to give another command...")
+                    else:
+                        print("\n🎤 Listening for wake word 'Spotify'...")
+                    hidden = self.connections.end_warmup()
+                    if hidden:
+                        print(f"⚡ {hidden * 1000:.0f} ms of connection setup hidden behind speech")
+                    self._handling_command = False
+                # Add a small delay to prevent excessive CPU usage
+                time.sleep(0.5)
+        finally:
+            if self.prefetcher is not None:
+                # Let a prefetch in progress finish before the cache closes under it
+                self.prefetcher.stop(timeout=5)
+            self.print_session_stats()
+            self._release_microphone()
+            # Persist cache access times / prefetch flags and drop pooled connections
+            if self.catalog_cache is not None:
+                self.catalog_cache.close()
+            self.connections.close()
 
 def main():
     print("Spotify Voice Assistant")
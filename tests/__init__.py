@@ -0,0 +1,23 @@
+"""
+Tests for the Spotify Voice Assistant
+
+Run from the repository root with `python -m unittest` (or pytest). Without a
+personal config.py, the settings from config.py.example are used.
+"""
+
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+try:
+    import config  # noqa: F401
+except ImportError:
+    _loader = importlib.machinery.SourceFileLoader('config', os.path.join(ROOT, 'config.py.example'))
+    _config = importlib.util.module_from_spec(importlib.util.spec_from_loader('config', _loader))
+    _loader.exec_module(_config)
+    sys.modules['config'] = _config
@@ -0,0 +1,84 @@
+"""Shared-memory frame ring and capture resampling"""
+
+import types
+import unittest
+
+import numpy as np
+
+from audio_worker import READER_OVERRUNS, RESAMPLE_TAPS, SharedFrameRing, _Resampler, _RingStream
+
+
+class ResamplerTests(unittest.TestCase):
+    def test_matches_straight_decimation(self):
+        # 48 kHz -> 16 kHz: each output sample should be every third input
+        # sample, delayed by the anti-alias filter's group delay
+        device_rate, output_rate, frame_samples = 48000, 16000, 1024
+        input_samples = frame_samples * device_rate // output_rate
+        resampler = _Resampler(input_samples, frame_samples, device_rate, output_rate)
+
+        frames = 6
+        t = np.arange(frames * input_samples) / device_rate
+        tone = (8000 * np.sin(2 * np.pi * 1000 * t)).astype(np.int16)
+        output = np.concatenate([resampler.process(tone[i * input_samples:(i + 1) * input_samples])
+                                 for i in range(frames)]).astype(np.float64)
+
+        delay = (RESAMPLE_TAPS - 1) // 2
+        n = np.arange(frames * frame_samples)
+        expected = 8000 * np.sin(2 * np.pi * 1000 * (3 * n - delay) / device_rate)
+
+        # Skip the first frame while the filter history fills up
+        error = output[frame_samples:] - expected[frame_samples:]
+        self.assertLess(np.sqrt(np.mean(error ** 2)) / 8000, 0.01)
+
+    def test_passthrough_at_output_rate(self):
+        resampler = _Resampler(160, 160, 16000, 16000)
+        samples = np.arange(160, dtype=np.int16)
+        self.assertIs(resampler.process(samples), samples)
+
+
+class RingStreamTests(unittest.TestCase):
+    def setUp(self):
+        self.ring = SharedFrameRing(slots=4, frame_samples=8)
+        self.source = types.SimpleNamespace(
+            ring=self.ring, CHUNK=8, SAMPLE_RATE=16000, read_timeout=1.0, read_seq=0, last_energy=0.0,
+            process=types.SimpleNamespace(is_alive=lambda: True), worker_error=lambda: None)
+        self.stream = _RingStream(self.source)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def write(self, count, start=0):
+        for value in range(start, start + count):
+            self.ring.write(np.full(8, value, dtype=np.int16), float(value))
+
+    def test_reads_in_order(self):
+        self.write(3)
+        for value in range(3):
+            self.assertEqual(np.frombuffer(self.stream.read(8), dtype=np.int16)[0], value)
+        self.assertEqual(self.ring.header[READER_OVERRUNS], 0)
+
+    def test_skips_ahead_after_falling_a_ring_behind(self):
+        self.write(10)
+        self.assertEqual(np.frombuffer(self.stream.read(8), dtype=np.int16)[0], 7)
+        self.assertEqual(self.ring.header[READER_OVERRUNS], 7)
+
+    def test_writer_advancing_during_read(self):
+        # The writer laps the reader between the WRITE_SEQ check and the frame lookup
+        self.write(2)
+        frame = self.ring.frame
+        laps = []
+
+        def racing_frame(seq):
+            if not laps:
+                laps.append(seq)
+                self.write(6, start=2)
+            return frame(seq)
+
+        self.ring.frame = racing_frame
+        self.assertEqual(np.frombuffer(self.stream.read(8), dtype=np.int16)[0], 5)
+        self.assertEqual(self.source.read_seq, 6)
+        self.assertEqual(self.ring.header[READER_OVERRUNS], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Command grammar and n-best transcript selection"""
+
+import contextlib
+import io
+import unittest
+
+from spotify_assistant import SpotifyAssistant
+
+
+class TranscriptTests(unittest.TestCase):
+    def setUp(self):
+        self.assistant = SpotifyAssistant(enable_audio=False, cache_path=None)
+        self.assistant.usage_history = None
+
+    def choose(self, alternatives):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.assistant.choose_transcript(alternatives)
+
+    def test_complete_top_hypothesis_is_kept(self):
+        # Low recognizer confidence on the top hypothesis must not hand the
+        # command to an alternative that merely parses
+        self.assertEqual(self.choose([('pause', 0.62), ('play', None)]), 'pause')
+        self.assertEqual(self.choose([('skip', 0.7), ('stop', None)]), 'skip')
+        self.assertEqual(self.choose([('volume 40', 0.7), ('volume 14', None)]), 'volume 40')
+        self.assertEqual(self.choose([('what song is this', 0.9), ('play song is this', None)]), 'what song is this')
+
+    def test_unparseable_top_hypothesis_is_rescued(self):
+        self.assertEqual(self.choose([('spotty five', 0.8), ('skip', None), ('stop', None)]), 'skip')
+        self.assertEqual(self.assistant.nbest_stats['rescued'], 1)
+
+    def test_top_hypothesis_missing_its_argument_is_reranked(self):
+        self.assertEqual(self.choose([('play playlist', 0.9), ('play playlist jazz', None)]), 'play playlist jazz')
+        self.assertEqual(self.choose([('volume 400', 0.9), ('volume 40', None)]), 'volume 40')
+
+    def test_nothing_parses_falls_back_to_top(self):
+        self.assertEqual(self.choose([('hello there', 0.9), ('yellow chair', None)]), 'hello there')
+
+    def test_exit_words_in_names_do_not_quit(self):
+        parse = self.assistant.parse_command
+        self.assertEqual(parse('play song quite miss home'), ('search_and_play', 'quite miss home'))
+        self.assertEqual(parse('search and play exit music'), ('search_and_play', 'exit music'))
+        self.assertEqual(parse('play artist exit'), ('play_artist', 'exit'))
+        self.assertEqual(parse('play playlist quit smoking'), ('play_playlist', 'quit smoking'))
+
+    def test_quit_phrases(self):
+        parse = self.assistant.parse_command
+        for command in ('quit', 'exit', 'stop listening', 'quit now', 'please quit', 'okay exit'):
+            self.assertEqual(parse(command), ('stop_listening', None), command)
+
+    def test_what_song(self):
+        parse = self.assistant.parse_command
+        self.assertEqual(parse('what song is playing'), ('what_song', None))
+        self.assertEqual(parse('tell me the current song'), ('what_song', None))
+        self.assertEqual(parse('search and play what song'), ('search_and_play', 'what song'))
+
+
+if __name__ == '__main__':
+    unittest.main()